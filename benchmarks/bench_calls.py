@@ -0,0 +1,36 @@
+"""Per-call cost of the `@predicate` and `@action` wrappers
+
+Run from the root of the repository:
+
+    python benchmarks/bench_calls.py
+"""
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "pddl"))
+
+from logistics import LogisticsProblem  # noqa: E402
+
+
+def main(number: int = 200000):
+    p = LogisticsProblem()
+    pkg, loc = p.pkgs["p1"], p.airports["lhr"]
+
+    timings = {
+        "tuple (reference)": lambda: (pkg, loc),
+        "self.at(pkg, loc)": lambda: p.at(pkg, loc),
+        "~self.at(pkg, loc)": lambda: ~p.at(pkg, loc),
+        "self.at(pkg, loc).render()": lambda: p.at(pkg, loc).render(),
+    }
+    for name, fn in timings.items():
+        secs = min(timeit.repeat(fn, number=number, repeat=3))
+        print(f"{name:<30} {secs / number * 1e9:8.0f} ns/call")
+
+    secs = min(timeit.repeat(p.load_truck, number=number // 100, repeat=3))
+    print(f"{'self.load_truck()':<30} {secs / (number // 100) * 1e9:8.0f} ns/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Solve the bundled examples and scaled versions of them with the
+built-in planner, and check every plan with the validator
+
+Run from the root of the repository:
+
+    python benchmarks/bench_planner.py
+    python benchmarks/bench_planner.py --sizes "[100,200]" --domains logistics
+
+The run fails with exit status 1 if a problem is not solved, a plan is
+invalid, or a problem takes longer than `time_limit` seconds. It needs no
+external planner, so it can gate CI. With `--symmetry`, A* with the
+admissible "max" heuristic also solves each problem without symmetry
+pruning, and fails if the plans differ in length, as both are optimal.
+`symmetric_aircargo` is then solved as well.
+"""
+import sys
+import time
+from pathlib import Path
+
+import fire
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from generators import GENERATORS  # noqa: E402
+from aircargo import AirCargoDomain, AirCargoProblem  # noqa: E402
+from py2pddl import init, goal  # noqa: E402
+from py2pddl.parse import load_problem  # noqa: E402
+from py2pddl.plan import Planner  # noqa: E402
+from py2pddl.validate import Validator  # noqa: E402
+
+EXAMPLES = Path(__file__).resolve().parents[1] / "pddl"
+
+# Sizes of the scaled problems solved by default, each within seconds
+SIZES = {"logistics": 100, "blocksworld": 20, "aircargo": 100}
+
+
+def symmetric_aircargo():
+    """Aircargo problem whose planes and airports are both interchangeable,
+    with atoms such as (plane-at p0 a1) that move with either"""
+    D = AirCargoDomain
+
+    class SymmetricAirCargoProblem(AirCargoProblem):
+
+        def __init__(self):
+            super().__init__()
+            self.cargos = D.Cargo.create_objs(range(2), prefix="c")
+            self.planes = D.Plane.create_objs(range(2), prefix="p")
+            self.airports = D.Airport.create_objs(range(3), prefix="a")
+
+        @init
+        def init(self):
+            return [self.cargo_at(self.cargos[0], self.airports[2]),
+                    self.cargo_at(self.cargos[1], self.airports[1]),
+                    self.plane_at(self.planes[0], self.airports[1]),
+                    self.plane_at(self.planes[1], self.airports[1])]
+
+        @goal
+        def goal(self):
+            return [self.cargo_at(self.cargos[0], self.airports[0]),
+                    self.cargo_at(self.cargos[1], self.airports[0])]
+
+    return SymmetricAirCargoProblem()
+
+
+def solve(problem, algorithm: str, heuristic: str,
+          symmetry: bool = False) -> tuple:
+    """Seconds taken to ground and search, whether the plan is valid, the
+    validation message or the reason for failing, and the plan"""
+    start = time.perf_counter()
+    result = Planner(problem, symmetry=symmetry).search(algorithm, heuristic)
+    seconds = time.perf_counter() - start
+    if result.plan is None:
+        return (seconds, False,
+                f"no plan after {result.expanded} expansions", None)
+    validation = Validator(problem).validate(result.plan)
+    return (seconds, validation.valid,
+            f"{validation.message}, {result.expanded} expansions",
+            result.plan)
+
+
+def main(sizes=None,
+         domains=tuple(GENERATORS),
+         algorithm: str = "gbfs",
+         heuristic: str = "ff",
+         symmetry: bool = False,
+         time_limit: float = 30):
+    """Solve and validate the bundled examples and their scaled versions
+
+    Args:
+        sizes (list, optional): Numbers of objects of the scaled problems.
+            Defaults to the ones in `SIZES`.
+        domains (list, optional): Names of the examples to run. Defaults
+            to all of them.
+        algorithm (str, optional): "gbfs" or "astar". Defaults to "gbfs".
+        heuristic (str, optional): "ff", "add" or "max". Defaults to "ff".
+        symmetry (bool, optional): Prune symmetric states, and check
+            that A* with "max" finds plans as short as without pruning.
+            Defaults to False.
+        time_limit (float, optional): Seconds above which a problem
+            fails. Defaults to 30.
+    """
+    if isinstance(sizes, int):
+        sizes = [sizes]
+    if isinstance(domains, str):
+        domains = [domains]
+
+    problems = [(name, lambda name=name: load_problem(
+        str(EXAMPLES / f"{name}.py"))()) for name in domains]
+    problems += [(f"{name}/{n}", lambda name=name, n=n: GENERATORS[name](n))
+                 for name in domains
+                 for n in (sizes or [SIZES[name]])]
+    check = symmetry and algorithm == "astar" and heuristic == "max"
+    if check:
+        problems.append(("aircargo/symmetric", symmetric_aircargo))
+
+    failures = 0
+    for name, create in problems:
+        problem = create()
+        seconds, valid, message, plan = solve(problem, algorithm, heuristic,
+                                              symmetry)
+        if valid and check:
+            optimal = solve(problem, algorithm, heuristic)[3]
+            if optimal is None or len(optimal) != len(plan):
+                valid = False
+                message += (", but the plan without symmetry has "
+                            f"{len(optimal) if optimal else 'no'} steps")
+        ok = valid and seconds <= time_limit
+        failures += not ok
+        print(f"{'ok' if ok else 'FAILED':<8} {name:<18} {seconds:8.3f}s "
+              f"{message}")
+    if failures:
+        print(f"\n{failures} problem(s) failed.")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
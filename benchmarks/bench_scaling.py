@@ -0,0 +1,176 @@
+"""Wall time and peak memory of each generation phase for the bundled
+domains scaled from 10^3 to 10^6 objects, compared against a baseline
+
+Run from the root of the repository:
+
+    python benchmarks/bench_scaling.py
+    python benchmarks/bench_scaling.py --sizes "[1000000]" --repeat 1
+    python benchmarks/bench_scaling.py --update
+
+The default sizes stop at 10^5 to keep the run short. The baseline also
+has 10^6, which is compared when it is asked for as above.
+
+The run fails with exit status 1 if a phase is slower or uses more memory
+than its baseline by more than the tolerances. Timings depend on the
+machine, so the baseline should be updated with `--update` when moving
+to a different one.
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+import fire
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from generators import GENERATORS  # noqa: E402
+from py2pddl.py2pddl import _domain_cache, _atoms, _flatten  # noqa: E402
+
+BASELINE = Path(__file__).with_name("baseline.json")
+
+# Differences below these are noise, whatever the tolerance
+MIN_SECONDS = 0.005
+MIN_BYTES = 1 << 16
+
+
+def phases(generator, n: int, filename: str) -> dict:
+    """Functions running each phase of generating a problem of size `n`,
+    in order. Later phases use the instance created by the first one."""
+    state = {}
+
+    def create():
+        state["p"] = generator(n)
+
+    def domain():
+        _domain_cache.pop(state["p"].__class__, None)
+        return state["p"]._render_domain()
+
+    def init():
+        return list(_flatten(_atoms(state["p"].init, {})))
+
+    return {
+        "create": create,
+        "domain": domain,
+        "objects": lambda: state["p"]._generate_objects(),
+        "init": init,
+        "render": lambda: state["p"]._render_problem({}, {}),
+        "write": lambda: state["p"].generate_problem_pddl(
+            filename=filename, stream=True, verbose=False),
+    }
+
+
+def measure(fn, repeat: int) -> dict:
+    """Best wall time of `repeat` runs, and the peak memory allocated by
+    one more run under tracemalloc, which would distort the timings"""
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    current = tracemalloc.get_traced_memory()[0]
+    result = fn()
+    peak = tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    del result
+    return {"seconds": min(seconds), "peak_bytes": peak}
+
+
+def run(sizes, domains, repeat: int) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "problem")
+        for name in domains:
+            for n in sizes:
+                for phase, fn in phases(GENERATORS[name], n, filename).items():
+                    key = f"{name}/{n}/{phase}"
+                    results[key] = measure(fn, repeat)
+                    print(f"{key:<28} {results[key]['seconds']:9.4f}s "
+                          f"{results[key]['peak_bytes'] / 2**20:9.2f}MB")
+    return results
+
+
+def compare(results: dict, baseline: dict,
+            time_tolerance: float, memory_tolerance: float) -> list:
+    """Descriptions of the phases that regressed against the baseline"""
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        base = baseline[key]
+        if (result["seconds"] > base["seconds"] * time_tolerance
+                and result["seconds"] - base["seconds"] > MIN_SECONDS):
+            regressions.append(
+                f"{key}: {result['seconds']:.4f}s against "
+                f"{base['seconds']:.4f}s "
+                f"({result['seconds'] / base['seconds']:.2f}x)")
+        if (result["peak_bytes"] > base["peak_bytes"] * memory_tolerance
+                and result["peak_bytes"] - base["peak_bytes"] > MIN_BYTES):
+            regressions.append(
+                f"{key}: {result['peak_bytes'] / 2**20:.2f}MB against "
+                f"{base['peak_bytes'] / 2**20:.2f}MB "
+                f"({result['peak_bytes'] / max(base['peak_bytes'], 1):.2f}x)")
+    return regressions
+
+
+def main(sizes=(1000, 10000, 100000),
+         domains=tuple(GENERATORS),
+         repeat: int = 3,
+         baseline: str = str(BASELINE),
+         update: bool = False,
+         time_tolerance: float = 1.5,
+         memory_tolerance: float = 1.2):
+    """Benchmark the generation phases and compare against a baseline
+
+    Args:
+        sizes (list, optional): Numbers of objects of the problems.
+            Defaults to 10^3, 10^4 and 10^5. The baseline also has 10^6.
+        domains (list, optional): Names of the generators to run.
+            Defaults to all of them.
+        repeat (int, optional): Number of timed runs of each phase.
+            Defaults to 3.
+        baseline (str, optional): JSON file of the baseline results.
+            Defaults to "baseline.json" next to this script.
+        update (bool, optional): Merge the results into the baseline
+            instead of comparing against it. Defaults to False.
+        time_tolerance (float, optional): Ratio to the baseline time
+            above which a phase fails. Defaults to 1.5.
+        memory_tolerance (float, optional): Ratio to the baseline peak
+            memory above which a phase fails. Defaults to 1.2.
+    """
+    if isinstance(sizes, int):
+        sizes = [sizes]
+    if isinstance(domains, str):
+        domains = [domains]
+    results = run(sizes, domains, repeat)
+
+    baseline = Path(baseline)
+    stored = (json.loads(baseline.read_text(encoding="utf-8"))
+              if baseline.exists() else {})
+    if update:
+        stored.update(results)
+        baseline.write_text(json.dumps(stored, indent=2, sort_keys=True)
+                            + "\n", encoding="utf-8")
+        print(f"Baseline written to {baseline}.")
+        return
+
+    missing = [key for key in results if key not in stored]
+    if missing:
+        print(f"No baseline for {len(missing)} phase(s), e.g. {missing[0]}. "
+              "Run with --update to record them.")
+    regressions = compare(results, stored, time_tolerance, memory_tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {baseline}:")
+        for regression in regressions:
+            print("  " + regression)
+        raise SystemExit(1)
+    print(f"\nNo regressions against {baseline}.")
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
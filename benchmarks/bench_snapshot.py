@@ -0,0 +1,91 @@
+"""Startup time of a worker process that needs the domain of an example:
+importing its module against loading a pickled snapshot of its domain
+
+Run from the root of the repository:
+
+    python benchmarks/bench_snapshot.py
+
+Each startup runs in a fresh interpreter, after py2pddl itself is
+imported, and ends when the worker has the domain PDDL and the schemas of
+all actions. "pickle" is only unpickling the snapshot, without building
+the Domain subclass.
+"""
+import sys
+import json
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+
+import fire
+
+ROOT = Path(__file__).resolve().parents[1]
+EXAMPLES = ROOT / "pddl"
+
+# Run in the worker; prints the seconds taken by each way of starting up
+WORKER = """
+import sys, time, json, pickle
+from py2pddl.py2pddl import action_schema
+from py2pddl.parse import load_problem
+from py2pddl.snapshot import domain_class
+
+def ready(cls):
+    cls().render_domain()
+    for name in cls._registry["action"]:
+        action_schema(cls, name)
+
+infile, snapshot, way = sys.argv[1:]
+start = time.perf_counter()
+if way == "import":
+    ready(load_problem(infile))
+elif way == "snapshot":
+    with open(snapshot, "rb") as f:
+        ready(domain_class(pickle.load(f)))
+else:
+    with open(snapshot, "rb") as f:
+        pickle.load(f)
+print(json.dumps(time.perf_counter() - start))
+"""
+
+WAYS = ("import", "snapshot", "pickle")
+
+
+def startup(infile: str, snapshot: str, way: str) -> float:
+    out = subprocess.run([sys.executable, "-c", WORKER, infile, snapshot, way],
+                         cwd=ROOT, check=True, capture_output=True, text=True)
+    return json.loads(out.stdout)
+
+
+def main(domains=("logistics", "blocksworld", "aircargo"), repeat: int = 20):
+    """Median startup time of a worker for each example
+
+    Args:
+        domains (list, optional): Names of the examples to run. Defaults
+            to all of them.
+        repeat (int, optional): Number of workers started for each way
+            and example. Defaults to 20.
+    """
+    if isinstance(domains, str):
+        domains = [domains]
+
+    sys.path.insert(0, str(ROOT))
+    from py2pddl.parse import load_problem  # pylint:disable=import-outside-toplevel
+    from py2pddl.snapshot import dump  # pylint:disable=import-outside-toplevel
+
+    print(f"{'domain':<14}" + "".join(f"{way:>12}" for way in WAYS)
+          + f"{'saved':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in domains:
+            infile = str(EXAMPLES / f"{name}.py")
+            snapshot = str(Path(tmp) / f"{name}.snapshot")
+            dump(load_problem(infile), snapshot)
+            times = {way: statistics.median(
+                startup(infile, snapshot, way) for _ in range(repeat))
+                for way in WAYS}
+            print(f"{name:<14}" + "".join(f"{times[way] * 1e6:10.0f}us"
+                                          for way in WAYS)
+                  + f"{(times['import'] - times['snapshot']) * 1e6:10.0f}us")
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
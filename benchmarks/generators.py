@@ -0,0 +1,126 @@
+"""Problem instances of the bundled example domains, scaled by a size `n`
+
+Each generator returns an instance of a subclass of the example's Problem
+class with roughly `n` objects and `n` or more :init facts.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "pddl"))
+
+from py2pddl import init, goal  # noqa: E402
+from aircargo import AirCargoDomain, AirCargoProblem  # noqa: E402
+from blocksworld import BlocksDomain, BlocksProblem  # noqa: E402
+from logistics import LogisticsDomain, LogisticsProblem  # noqa: E402
+
+
+def logistics(n: int):
+    """`n` packages in `n // 100` cities, each with an airport, two
+    locations and a truck, and one airplane per ten cities"""
+    D = LogisticsDomain
+    cities = max(1, n // 100)
+
+    class ScaledLogisticsProblem(LogisticsProblem):
+
+        def __init__(self):
+            super().__init__()
+            self.cities = D.City.create_objs(range(cities), prefix="city")
+            self.airports = D.Airport.create_objs(range(cities), prefix="apt")
+            self.locations = D.Location.create_objs(range(2 * cities),
+                                                    prefix="loc")
+            self.trucks = D.Truck.create_objs(range(cities), prefix="truck")
+            self.airplanes = D.Airplane.create_objs(
+                range(max(1, cities // 10)), prefix="plane")
+            self.pkgs = D.Package.create_objs(range(n), prefix="pkg")
+
+        @init
+        def init(self) -> list:
+            facts = []
+            for c in range(cities):
+                city = self.cities[c]
+                facts.append(self.in_city(self.airports[c], city))
+                facts.append(self.in_city(self.locations[2 * c], city))
+                facts.append(self.in_city(self.locations[2 * c + 1], city))
+                facts.append(self.at(self.trucks[c], self.airports[c]))
+            for a in range(len(self.airplanes)):
+                facts.append(self.at(self.airplanes[a], self.airports[a]))
+            for p in range(n):
+                facts.append(self.at(self.pkgs[p],
+                                     self.locations[p % (2 * cities)]))
+            return facts
+
+        @goal
+        def goal(self) -> list:
+            return [self.at(self.pkgs[p],
+                            self.locations[(p + 1) % (2 * cities)])
+                    for p in range(n)]
+
+    return ScaledLogisticsProblem()
+
+
+def blocksworld(n: int):
+    """`n` blocks in towers of ten, to be stacked in reverse"""
+    D = BlocksDomain
+
+    class ScaledBlocksProblem(BlocksProblem):
+
+        def __init__(self):
+            self.blocks = D.Block.create_objs(range(n), prefix="b")
+
+        @init
+        def init(self) -> list:
+            facts = []
+            for b in range(n):
+                if b % 10 == 0:
+                    facts.append(self.clear(self.blocks[b]))
+                if b % 10 == 9 or b == n - 1:
+                    facts.append(self.ontable(self.blocks[b]))
+                else:
+                    facts.append(self.on(self.blocks[b], self.blocks[b + 1]))
+            return facts
+
+        @goal
+        def goal(self) -> list:
+            return [self.on(self.blocks[b + 1], self.blocks[b])
+                    for b in range(n - 1) if b % 10 != 9]
+
+    return ScaledBlocksProblem()
+
+
+def aircargo(n: int):
+    """`n` cargos, `n // 100 + 2` airports and `n // 100 + 1` planes"""
+    D = AirCargoDomain
+    airports = n // 100 + 2
+    planes = n // 100 + 1
+
+    class ScaledAirCargoProblem(AirCargoProblem):
+
+        def __init__(self):
+            super().__init__()
+            self.cargos = D.Cargo.create_objs(range(n), prefix="c")
+            self.planes = D.Plane.create_objs(range(planes), prefix="p")
+            self.airports = D.Airport.create_objs(range(airports),
+                                                  prefix="apt")
+
+        @init
+        def init(self):
+            return ([self.cargo_at(self.cargos[c], self.airports[c % airports])
+                     for c in range(n)] +
+                    [self.plane_at(self.planes[p], self.airports[p % airports])
+                     for p in range(planes)])
+
+        @goal
+        def goal(self):
+            return [self.cargo_at(self.cargos[c],
+                                  self.airports[(c + 1) % airports])
+                    for c in range(n)]
+
+    return ScaledAirCargoProblem()
+
+
+GENERATORS = {
+    "logistics": logistics,
+    "blocksworld": blocksworld,
+    "aircargo": aircargo,
+}
@@ -59,6 +59,8 @@ class AirCargoProblem(AirCargoDomain):
         return at
 
     @goal
-    def goal(self):
-        return [self.cargo_at(self.cargos[1], self.airports["jfk"]),
-                self.cargo_at(self.cargos[2], self.airports["sfo"])]
\ No newline at end of file
+    def goal(self, cargo=None):
+        # Each cargo goes to the other airport, or only `cargo` if given
+        dest = {1: "jfk", 2: "sfo"}
+        return [self.cargo_at(self.cargos[c], self.airports[dest[c]])
+                for c in (dest if cargo is None else [cargo])]
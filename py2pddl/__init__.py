@@ -1,4 +1,4 @@
-from .py2pddl import Domain, create_type
+from .py2pddl import Domain, Atom, AtomBatch, create_type
 from .py2pddl import predicate, action, goal, init
 
 __version__ = "1.0.0"
@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import itertools
+import traceback
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import fire
+
+from .py2pddl import _pddl_filename
+from .parse import load_problem
+
+# Problem instance of the worker process, created once by `_init_worker`
+_problem = None
+
+
+def batch(infile: str,
+          kwargs: str = None,
+          grid=None,
+          outdir: str = ".",
+          domain: str = "domain",
+          problem: str = "problem_{index}",
+          workers: int = None,
+          stream: bool = False,
+          compression: str = None):
+    """Generate one domain PDDL file and many problem PDDL files from a
+    Python module, each problem with different `init` and `goal` keyword
+    arguments
+
+    Args:
+        infile (str): Name of Python file containing both the Domain
+            and Problem class definitions.
+        kwargs (str, optional): JSONL file where each line is an object
+            with optional "init" and "goal" keys holding the keyword
+            arguments of one problem instance.
+        grid (dict or str, optional): Parameter grid of the form
+            `{"init": {"n": [1, 2]}, "goal": {"cargo": ["c1", "c2"]}}`,
+            or a JSON file containing it. One problem is generated for
+            every combination of values.
+        outdir (str, optional): Directory of the PDDL files.
+            Defaults to ".".
+        domain (str, optional): Base name of domain PDDL file.
+            Defaults to "domain".
+        problem (str, optional): Template of the base name of each problem
+            PDDL file. It is formatted with `index`, `init` and `goal`,
+            e.g. "problem_{init[n]}_{index}". Defaults to "problem_{index}".
+        workers (int, optional): Number of worker processes.
+            Defaults to the number of CPUs.
+        stream (bool, optional): Stream the atoms of each problem to its
+            file. See `Domain.generate_problem_pddl`. Defaults to False.
+        compression (str, optional): "gzip" or "xz" to compress the
+            problem files, which are then always streamed.
+            Defaults to None.
+
+    Returns:
+        dict: Summary of the number of problems written, bytes written,
+            elapsed time and throughput, and the files of the problems
+            that failed. A failing problem is reported and does not stop
+            the others.
+    """
+    if (kwargs is None) == (grid is None):
+        raise ValueError("Specify exactly one of `kwargs` or `grid`.")
+    instances = _read_kwargs(kwargs) if kwargs else _expand_grid(grid)
+
+    outdir = Path(outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+
+    start = time.perf_counter()
+
+    # The domain only depends on the class, so it is written once
+    Problem = load_problem(infile)
+    Problem().generate_domain_pddl(filename=str(outdir / domain))
+
+    tasks = []
+    for i, kw in enumerate(instances):
+        init, goal = kw.get("init") or {}, kw.get("goal") or {}
+        filename = problem.format(index=i, init=init, goal=goal)
+        tasks.append((str(outdir / filename), init, goal, stream,
+                      compression))
+
+    workers = workers or os.cpu_count()
+    chunksize = max(1, len(tasks) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_worker,
+                             initargs=(infile,)) as executor:
+        results = list(executor.map(_generate, tasks, chunksize=chunksize))
+
+    nbytes, failed = 0, []
+    for (filename, init, goal, *_), (size, error) in zip(tasks, results):
+        if error is not None:
+            failed.append(filename)
+            print(f"Failed to generate {filename} with init={init} "
+                  f"goal={goal}\n{error}")
+            continue
+        nbytes += size
+
+    elapsed = time.perf_counter() - start
+    written = len(tasks) - len(failed)
+    summary = {
+        "problems": written,
+        "bytes": nbytes,
+        "seconds": round(elapsed, 3),
+        "problems_per_second": round(written / elapsed, 1),
+        "megabytes_per_second": round(nbytes / elapsed / 1e6, 2),
+        "failed": failed,
+    }
+    return summary
+
+
+def _read_kwargs(filename: str) -> list:
+    with open(filename, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _expand_grid(grid) -> list:
+    if isinstance(grid, str):
+        with open(grid, encoding="utf-8") as f:
+            grid = json.load(f)
+
+    # Flatten to (section, key) pairs so that the init and goal
+    # parameters are all crossed with each other
+    keys = [(section, key)
+            for section in ("init", "goal")
+            for key in grid.get(section, {})]
+    values = [grid[section][key] for section, key in keys]
+
+    instances = []
+    for combination in itertools.product(*values):
+        kw = {"init": {}, "goal": {}}
+        for (section, key), value in zip(keys, combination):
+            kw[section][key] = value
+        instances.append(kw)
+    return instances
+
+
+def _init_worker(infile: str):
+    global _problem
+    _problem = load_problem(infile)()
+
+
+def _generate(task) -> tuple:
+    """Returns the size of the file written, or the traceback of the
+    error"""
+    filename, init, goal, stream, compression = task
+    try:
+        _problem.generate_problem_pddl(init=init, goal=goal,
+                                       filename=filename, stream=stream,
+                                       verbose=False,
+                                       compression=compression)
+    except Exception:  # pylint:disable=broad-except
+        return 0, traceback.format_exc()
+    return Path(_pddl_filename(filename, compression)).stat().st_size, None
+
+
+if __name__ == "__main__":
+    fire.Fire(batch)
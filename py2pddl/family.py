@@ -0,0 +1,136 @@
+from itertools import islice
+
+from .py2pddl import (CHUNK_SIZE, open_pddl, _atoms, _atom_list, _flatten,
+                      _pddl_filename, _render_goal)
+
+
+class ProblemFamily:
+    """Variants of a problem instance that differ from it by a few :init
+    atoms or by their goal
+
+    The base problem is rendered once: its header and objects, its goal,
+    and its :init atoms in chunks of `CHUNK_SIZE` atoms, each kept both
+    as its rendered atoms and as their joined text. A variant is described
+    by the atoms it adds to and removes from :init, and optionally another
+    goal. Only the chunks it removes atoms from are joined again, and the
+    text of the others is reused as is, so the base atoms are shared by
+    all variants and never copied.
+
+    Added atoms come after the base ones, and an added atom that the base
+    :init already has is left out. Without any change, a variant is the
+    same text as `problem.render_problem(init=init, goal=goal)`.
+
+        family = ProblemFamily(p)
+        family.generate_problem_pddl(
+            filename="variant",
+            add=[p.at(p.trucks["truck"], p.locations["south"])],
+            remove=[p.at(p.trucks["truck"], p.airports["cdg"])])
+
+    Args:
+        problem (Domain): Instance of a subclassed Domain with its objects
+            created.
+        init (dict, optional): Keyword arguments for the `@init` method.
+        goal (dict, optional): Keyword arguments for the `@goal` method.
+    """
+
+    def __init__(self, problem, init: dict = None, goal: dict = None):
+        self.problem = problem
+        self._head = "\n".join([problem._generate_header_prob(),
+                                problem._generate_objects(), "\t(:init "])
+
+        # Rendered atoms of each chunk, the joined text of each chunk, and
+        # the chunks that each rendered atom is in
+        self._chunks = []
+        self._texts = []
+        self._chunk_of = {}
+        atoms = _flatten(_atoms(problem.init, init or {}))
+        chunk = [atom.render() for atom in islice(atoms, CHUNK_SIZE)]
+        while chunk:
+            chunk = [atom for atom in chunk if atom]
+            for atom in chunk:
+                self._chunk_of.setdefault(atom, []).append(len(self._chunks))
+            self._chunks.append(chunk)
+            self._texts.append(" ".join(chunk))
+            chunk = [atom.render() for atom in islice(atoms, CHUNK_SIZE)]
+
+        self._goal = self._render_goal(goal or {})
+
+    def render(self, *,
+               add: list = (),
+               remove: list = (),
+               goal=None) -> str:
+        """Problem PDDL of a variant as a string
+
+        Args:
+            add (list, optional): Atoms added to :init.
+            remove (list, optional): Atoms removed from :init. Each one
+                must be in the :init of the base problem.
+            goal (dict or list, optional): Keyword arguments for the
+                `@goal` method, or the goal atoms. Defaults to the goal
+                of the base problem.
+        """
+        return "".join(self._pieces(add, remove, goal))
+
+    def write(self, f, *,
+              add: list = (),
+              remove: list = (),
+              goal=None):
+        """Write the problem PDDL of a variant to a text file object,
+        one chunk at a time. See `render` for the arguments."""
+        for piece in self._pieces(add, remove, goal):
+            f.write(piece)
+
+    def generate_problem_pddl(self, *,
+                              filename: str = "problem",
+                              add: list = (),
+                              remove: list = (),
+                              goal=None,
+                              verbose: bool = True,
+                              compression: str = None):
+        """Write the problem PDDL file of a variant. See `render` for the
+        arguments of the variant.
+
+        Args:
+            filename (str, optional): Name of the file, without the
+                extension. Defaults to "problem".
+            verbose (bool, optional): Print the name of the file written.
+                Defaults to True.
+            compression (str, optional): "gzip" or "xz" to compress the
+                file. Defaults to None.
+        """
+        filename = _pddl_filename(filename, compression)
+        with open_pddl(filename, "w") as f:
+            self.write(f, add=add, remove=remove, goal=goal)
+        if verbose:
+            print(f"Problem PDDL written to {filename}.")
+
+    def _pieces(self, add, remove, goal):
+        removed = {atom.render() for atom in _flatten(remove)}
+        touched = set()
+        for atom in removed:
+            if atom not in self._chunk_of:
+                raise ValueError(f"{atom} is not in the :init of the base "
+                                 "problem")
+            touched.update(self._chunk_of[atom])
+        added = [atom for atom in dict.fromkeys(
+            atom.render() for atom in _flatten(add))
+            if atom and (atom in removed or atom not in self._chunk_of)]
+        goal = self._goal if goal is None else self._render_goal(goal)
+
+        yield self._head
+        sep = ""
+        for i, text in enumerate(self._texts):
+            if i in touched:
+                text = " ".join(atom for atom in self._chunks[i]
+                                if atom not in removed)
+            if text:
+                yield sep + text
+                sep = " "
+        if added:
+            yield sep + " ".join(added)
+        yield ")\n\t" + goal + "\n)\n"
+
+    def _render_goal(self, goal) -> str:
+        if isinstance(goal, dict):
+            goal = _atom_list(_atoms(self.problem.goal, goal))
+        return str(_render_goal(goal))
@@ -0,0 +1,247 @@
+from itertools import product
+from collections import namedtuple, defaultdict
+
+from .py2pddl import (Atom, PDDLObjects, PDDLDict, ActionSchema,
+                      action_schema, _atoms, _flatten)
+
+# A ground action. Each atom is a tuple of the predicate name followed by
+# the object names, e.g. ("at", "truck", "cdg").
+GroundAction = namedtuple(
+    "GroundAction", ["name", "args", "precond", "add", "delete"])
+
+
+class Grounder:
+    """Enumerates the ground actions of a problem instance
+
+    Objects are indexed by type, where each type also lists the objects
+    of its subtypes. Preconditions on static predicates, i.e. predicates
+    that no action changes, are checked against :init while the action
+    parameters are bound, so only assignments that satisfy them are
+    enumerated.
+
+    Args:
+        problem (Domain): Instance of a subclassed Domain with its objects
+            created.
+        init (dict, optional): Keyword arguments for the `@init` method.
+    """
+
+    def __init__(self, problem, init: dict = None):
+        self.problem = problem
+        self.schemas = [strips_schema(problem, name)
+                        for name in problem._registry["action"]]
+        self.objects = type_index(problem)
+        self._object_sets = {Type: set(names)
+                             for Type, names in self.objects.items()}
+        # Dicts rather than sets keep the enumeration order deterministic
+        self.init = dict.fromkeys(
+            ground_atom(atom)
+            for atom in _flatten(_atoms(problem.init, init or {})))
+
+        fluents = {pred for schema in self.schemas
+                   for pred, _ in schema.add + schema.delete}
+        self.static = {fn.name for fn in problem._registry["predicate"].values()
+                       if fn.name not in fluents}
+
+        # Static facts of :init, and projections of them for looking up
+        # the values of one argument given some of the others
+        self.static_facts = defaultdict(dict)
+        for fact in self.init:
+            if fact[0] in self.static:
+                self.static_facts[fact[0]][fact[1:]] = None
+        self._projections = {}
+        self._plans = {}
+
+    def actions(self):
+        """Iterate over all ground actions"""
+        for schema in self.schemas:
+            yield from self.ground(schema)
+
+    def count(self) -> dict:
+        """Number of ground actions of each action schema, without
+        enumerating the parameters that no static atom constrains"""
+        counts = {}
+        for schema in self.schemas:
+            static, order, free = self._plan(schema)
+            size = 1
+            for i in free:
+                size *= len(self.objects.get(schema.types[i], []))
+            n = sum(1 for _ in self._bind(schema, static, order, 0,
+                                          [None] * len(schema.params)))
+            counts[schema.name] = n * size
+        return counts
+
+    def ground(self, schema: ActionSchema):
+        """Iterate over the ground actions of one action schema"""
+        precond = [(pred, params) for pred, params in schema.precond
+                   if pred not in self.static]
+        for args in self.assignments(schema):
+            yield GroundAction(
+                schema.name, args,
+                [(pred, *map(args.__getitem__, params))
+                 for pred, params in precond],
+                [(pred, *map(args.__getitem__, params))
+                 for pred, params in schema.add],
+                [(pred, *map(args.__getitem__, params))
+                 for pred, params in schema.delete])
+
+    def assignments(self, schema: ActionSchema, partial: tuple = None):
+        """Iterate over the tuples of objects that can be assigned to the
+        parameters of an action schema
+
+        Args:
+            schema (ActionSchema): Action schema.
+            partial (tuple, optional): Objects already assigned to some
+                parameters, with None for the others.
+        """
+        args = list(partial or [None] * len(schema.params))
+        fixed = frozenset(i for i, arg in enumerate(args) if arg is not None)
+        static, order, free = self._plan(schema, fixed)
+        for i in fixed:
+            if args[i] not in self._object_sets.get(schema.types[i], ()):
+                return
+        if not all(tuple(map(args.__getitem__, params))
+                   in self.static_facts[pred] for pred, params in static
+                   if fixed.issuperset(params)):
+            return
+
+        free_objects = [self.objects.get(schema.types[i], []) for i in free]
+        for args in self._bind(schema, static, order, 0, args, fixed):
+            if not free:
+                yield tuple(args)
+                continue
+            for objs in product(*free_objects):
+                for i, obj in zip(free, objs):
+                    args[i] = obj
+                yield tuple(args)
+
+    def _plan(self, schema: ActionSchema, fixed: frozenset = frozenset()):
+        """Static preconditions of an action schema, the order in which
+        to bind the parameters they constrain, and the other parameters,
+        leaving out the `fixed` ones"""
+        key = (schema.name, fixed)
+        if key not in self._plans:
+            static = [(pred, params) for pred, params in schema.precond
+                      if pred in self.static]
+            constrained = {param for _, params in static
+                           for param in params} - fixed
+            order = _binding_order(sorted(constrained), static, fixed)
+            free = [i for i in range(len(schema.params))
+                    if i not in constrained and i not in fixed]
+            self._plans[key] = static, order, free
+        return self._plans[key]
+
+    def _bind(self, schema, static, order, k, args, fixed=frozenset()):
+        # Yields `args` itself, with the parameters in `order` bound
+        if k == len(order):
+            yield args
+            return
+
+        i = order[k]
+        bound = set(order[:k]) | fixed
+        Type = schema.types[i]
+        candidates = self.objects.get(Type, [])
+        for pred, params in static:
+            if i not in params:
+                continue
+            # Narrow down the candidates using the facts that agree
+            # with the parameters bound so far
+            positions = tuple(pos for pos, param in enumerate(params)
+                              if param in bound)
+            allowed = self._project(pred, params.index(i), positions).get(
+                tuple(args[params[pos]] for pos in positions), {})
+            if len(allowed) < len(candidates):
+                objects = self._object_sets.get(Type, set())
+                candidates = [obj for obj in allowed if obj in objects]
+            else:
+                candidates = [obj for obj in candidates if obj in allowed]
+
+        # Static atoms whose parameters are all bound once `i` is
+        checks = [(pred, params) for pred, params in static
+                  if i in params and bound.issuperset(set(params) - {i})]
+        for obj in candidates:
+            args[i] = obj
+            if all(tuple(map(args.__getitem__, params))
+                   in self.static_facts[pred] for pred, params in checks):
+                yield from self._bind(schema, static, order, k + 1, args,
+                                      fixed)
+        args[i] = None
+
+    def _project(self, pred: str, pos: int, bound: tuple) -> dict:
+        key = (pred, pos, bound)
+        if key not in self._projections:
+            projection = defaultdict(dict)
+            for fact in self.static_facts[pred]:
+                projection[tuple(fact[b] for b in bound)][fact[pos]] = None
+            self._projections[key] = projection
+        return self._projections[key]
+
+
+def ground(problem, init: dict = None) -> list:
+    """All ground actions of a problem instance. See `Grounder`."""
+    return list(Grounder(problem, init).actions())
+
+
+def strips_schema(domain, name: str) -> ActionSchema:
+    """Compiled schema of an `@action`, which must not have negative
+    preconditions"""
+    schema = action_schema(domain, name)
+    if schema.negative:
+        raise ValueError(f"Action '{schema.name}' has a negative precondition, "
+                         "which is not supported by STRIPS")
+    return schema
+
+
+def type_index(problem) -> dict:
+    """Object names of each type, including the objects of its subtypes,
+    in the order the objects were created"""
+    index = defaultdict(dict)
+    for Type, names in typed_objects(problem):
+        for Ancestor in problem._types.supertypes(Type):
+            index[Ancestor].update(dict.fromkeys(names))
+    return {Type: list(names) for Type, names in index.items()}
+
+
+def typed_objects(problem):
+    """Iterate over the object collections of a problem instance, in the
+    order they were created, as pairs of their type and the names of
+    their objects as in PDDL"""
+    types = problem._types
+    for objects in problem.__dict__.get("_objects", {}).values():
+        if isinstance(objects, PDDLObjects):
+            Type, names = objects.Type, objects.names
+        elif isinstance(objects, PDDLDict):
+            Type, names = types.by_name[objects.typ], [
+                str(obj) for obj in objects.values()]
+        elif objects:
+            Type, names = objects[0].__class__, [str(obj) for obj in objects]
+        else:
+            continue
+        yield Type, [_object_name(name) for name in names]
+
+
+def ground_atom(atom: Atom) -> tuple:
+    """Predicate name followed by the object names, as in PDDL"""
+    return (atom.name, *[_object_name(str(arg)) for arg in atom.args])
+
+
+def _object_name(name: str) -> str:
+    return name.replace("_", "-")
+
+
+def _binding_order(remaining: list, static: list,
+                   fixed: frozenset = frozenset()) -> list:
+    """Order in which to bind the action parameters, so that each one
+    shares as many static atoms as possible with those bound before it,
+    or already `fixed`"""
+    order = []
+    remaining = list(remaining)
+    while remaining:
+        def score(i):
+            linked = sum(1 for _, params in static
+                         if i in params and set(params) & (set(order) | fixed))
+            total = sum(1 for _, params in static if i in params)
+            return linked, total
+        best = max(remaining, key=score)
+        order.append(best)
+        remaining.remove(best)
+    return order
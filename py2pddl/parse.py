@@ -1,37 +1,310 @@
-import importlib
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import traceback
+import importlib.util
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 import fire
 
+from .py2pddl import COMPRESSION, open_pddl, _pddl_filename, _source_files
+
 def parse(infile: str,
           domain="domain",
-          problem="problem"):
+          problem="problem",
+          outdir: str = None,
+          workers: int = None,
+          init: dict = None,
+          goal: dict = None,
+          incremental: bool = False,
+          manifest: str = None,
+          profile=False,
+          compression: str = None):
     """Parse a Python module that contains both a Domain and Problem class
     definitions
 
     Args:
-        infile (str): Name of Python file containing both the Domain
-            and Problem class definitions.
+        infile (str or list): Name of Python file containing both the Domain
+            and Problem class definitions. It can also be a glob pattern,
+            a directory (all `.py` files in it) or a list of these, in
+            which case the modules are parsed in parallel.
         domain (str, optional): Base name of domain PDDL file.
-            Defaults to "domain".
+            Defaults to "domain". When there are several modules, the
+            name of each module is prepended, e.g. "logistics_domain".
         problem (str, optional): Base name of problem PDDL file.
-            Defaults to "problem".
+            Defaults to "problem". When there are several modules, the
+            name of each module is prepended, e.g. "logistics_problem".
+        outdir (str, optional): Directory of the PDDL files.
+            Defaults to the current directory.
+        workers (int, optional): Number of worker processes when there
+            are several modules. Defaults to the number of CPUs.
+        init (dict, optional): Keyword arguments for the `@init` method.
+        goal (dict, optional): Keyword arguments for the `@goal` method.
+        incremental (bool, optional): Skip modules whose sources,
+            including the modules their Domain classes are imported
+            from, and arguments have not changed since the last run and
+            whose outputs are untouched, and only write output files
+            whose text has changed. Defaults to False.
+        manifest (str, optional): JSON file recording the hashes of the
+            sources and outputs for `incremental`.
+            Defaults to ".py2pddl-manifest.json" in `outdir`.
+        profile (bool or str, optional): Measure the duration, atom
+            counts, bytes written and peak memory of each phase of each
+            module (see `Domain.profile`). If True, they are printed. If
+            a file name, they are appended to it as JSON lines.
+            Defaults to False.
+        compression (str, optional): "gzip" or "xz" to compress the PDDL
+            files. See `Domain.generate_problem_pddl`. Defaults to None.
+    """
+    infiles = _expand_infiles(infile)
+    if outdir is not None:
+        Path(outdir).mkdir(parents=True, exist_ok=True)
+    outdir = Path(outdir or ".")
+    init = init or {}
+    goal = goal or {}
+
+    entries = {}
+    if incremental:
+        manifest = Path(manifest or outdir / ".py2pddl-manifest.json")
+        if manifest.exists():
+            entries = json.loads(manifest.read_text(encoding="utf-8"))
+
+    if len(infiles) == 1 and not _is_pattern(infile):
+        tasks = [(infiles[0], str(outdir / domain), str(outdir / problem))]
+    else:
+        tasks = [(infile, str(outdir / f"{Path(infile).stem}_{domain}"),
+                  str(outdir / f"{Path(infile).stem}_{problem}"))
+                 for infile in infiles]
+    tasks = [(infile, domain, problem, init, goal, incremental,
+              entries.get(str(Path(infile).resolve())), bool(profile),
+              compression)
+             for infile, domain, problem in tasks]
+
+    if len(tasks) == 1 and not _is_pattern(infile):
+        _, entry, stats = _parse_one(*tasks[0])
+        if incremental:
+            entries[str(Path(infiles[0]).resolve())] = entry
+            _write_manifest(manifest, entries)
+        if profile:
+            _report(profile, infiles[0], stats)
+        return
+
+    # A failing module is reported and does not stop the others
+    start = time.perf_counter()
+    workers = workers or os.cpu_count()
+    if workers == 1:
+        results = map(_parse_task, tasks)
+    else:
+        executor = ProcessPoolExecutor(max_workers=min(workers, len(tasks)))
+        results = executor.map(_parse_task, tasks)
+    failures = []
+    for infile, seconds, status, entry, stats, error in results:
+        print(f"{status:<9} {seconds:8.3f}s  {infile}")
+        if error is not None:
+            failures.append(infile)
+            print(error)
+            continue
+        if incremental:
+            entries[str(Path(infile).resolve())] = entry
+        if profile:
+            _report(profile, infile, stats)
+    if workers != 1:
+        executor.shutdown()
+
+    if incremental:
+        _write_manifest(manifest, entries)
+
+    print(f"Parsed {len(tasks) - len(failures)} of {len(tasks)} modules "
+          f"in {time.perf_counter() - start:.2f}s.")
+    if failures:
+        raise RuntimeError(f"Failed to parse {len(failures)} module(s): "
+                           + ", ".join(failures))
+
+
+def _parse_one(infile: str, domain: str, problem: str,
+               init: dict, goal: dict,
+               incremental: bool = False, entry: dict = None,
+               profile: bool = False, compression: str = None,
+               verbose: bool = True) -> tuple:
+    """Returns the status ("ok", "unchanged" or "skipped"), the new
+    manifest entry of the module and the `PhaseStats` of its phases as
+    dicts"""
+    if incremental:
+        kwargs = _digest(json.dumps([domain, problem, init, goal],
+                                    sort_keys=True, default=str).encode())
+        # The sources are the files of all the modules that the classes
+        # were defined in, as recorded by the last run
+        if (entry is not None and entry.get("sources")
+                and all(_file_digest(filename) == digest
+                        for filename, digest in entry["sources"].items())
+                and entry["kwargs"] == kwargs
+                and all(_file_digest(filename) == digest
+                        for filename, digest in entry["outputs"].items())):
+            if verbose:
+                print(f"{infile} is unchanged. Skipped.")
+            return "skipped", entry, []
+
+    Problem = load_problem(infile)
+    if incremental:
+        # Without the file of a module, the module is never skipped
+        filenames = _source_files(Problem)
+        sources = filenames and {str(Path(filename).resolve()):
+                                 _file_digest(filename)
+                                 for filename in [infile, *filenames]}
+
+    p = Problem()
+    if not profile:
+        status, outputs = _generate(p, domain, problem, init, goal,
+                                    incremental, compression, verbose)
+        stats = []
+    else:
+        with p.profile() as stats:
+            status, outputs = _generate(p, domain, problem, init, goal,
+                                        incremental, compression, verbose)
+    if incremental:
+        entry = {"sources": sources, "kwargs": kwargs, "outputs": outputs}
+    return status, entry, [stat._asdict() for stat in stats]
+
+
+def _generate(p, domain: str, problem: str, init: dict, goal: dict,
+              incremental: bool, compression: str, verbose: bool) -> tuple:
+    """Returns the status and the hashes of the output files"""
+    if not incremental:
+        p.generate_domain_pddl(filename=domain, verbose=verbose,
+                               compression=compression)
+        p.generate_problem_pddl(init=init, goal=goal, filename=problem,
+                                verbose=verbose, compression=compression)
+        return "ok", None
+
+    # Files whose text is identical are not touched so that their
+    # modification times stay the same
+    status = "unchanged"
+    outputs = {}
+    for name, filename, text in [
+            ("Domain", _pddl_filename(domain, compression),
+             p._render_domain()),
+            ("Problem", _pddl_filename(problem, compression),
+             p._render_problem(init, goal))]:
+        data = text.encode("utf-8")
+        outputs[str(Path(filename).resolve())] = digest = _digest(data)
+        if _file_digest(filename) == digest:
+            if verbose:
+                print(f"{name} PDDL in {filename} is unchanged.")
+            continue
+        with p._phase(f"write {name.lower()}") as phase:
+            if Path(filename).suffix in COMPRESSION:
+                with open_pddl(filename, "w") as f:
+                    f.write(text)
+            else:
+                Path(filename).write_bytes(data)
+            phase.bytes = len(data)
+        status = "ok"
+        if verbose:
+            print(f"{name} PDDL written to {filename}.")
+
+    return status, outputs
+
+
+def _parse_task(task) -> tuple:
+    infile = task[0]
+    start = time.perf_counter()
+    try:
+        status, entry, stats = _parse_one(*task, verbose=False)
+        error = None
+    except Exception:  # pylint:disable=broad-except
+        status, entry, stats = "FAILED", None, []
+        error = traceback.format_exc()
+    return infile, time.perf_counter() - start, status, entry, stats, error
+
+
+def _report(profile, infile: str, stats: list):
+    """Print the phases of a module, or append them to the file named
+    `profile` as JSON lines"""
+    if profile is True:
+        for stat in stats:
+            atoms = "" if stat["atoms"] is None else stat["atoms"]
+            size = "" if stat["bytes"] is None else stat["bytes"]
+            peak = ("" if stat["peak_bytes"] is None
+                    else f"{stat['peak_bytes'] / 2**20:.2f}MB")
+            print(f"{stat['phase']:<14} {stat['seconds']:9.4f}s "
+                  f"{atoms:>9} atoms {size:>10} bytes {peak:>10} peak")
+        return
+    with open(profile, "a", encoding="utf-8") as f:
+        for stat in stats:
+            f.write(json.dumps({"module": infile, **stat}) + "\n")
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _file_digest(filename: str) -> str:
+    # Compressed files are hashed by their text
+    path = Path(filename)
+    if not path.exists():
+        return None
+    if path.suffix in COMPRESSION:
+        with open_pddl(filename) as f:
+            return _digest(f.read().encode("utf-8"))
+    return _digest(path.read_bytes())
+
+
+def _write_manifest(manifest: Path, entries: dict):
+    # Write to a temporary file first so that an interrupted run
+    # never leaves a partial manifest behind
+    tmp = manifest.with_name(manifest.name + ".tmp")
+    tmp.write_text(json.dumps(entries, indent=2, sort_keys=True),
+                   encoding="utf-8")
+    os.replace(tmp, manifest)
+
+
+def _is_pattern(infile) -> bool:
+    return (not isinstance(infile, str) or glob.has_magic(infile)
+            or Path(infile).is_dir())
+
+
+def _expand_infiles(infile) -> list:
+    patterns = [infile] if isinstance(infile, str) else list(infile)
+    infiles = []
+    for pattern in patterns:
+        pattern = str(pattern)
+        if Path(pattern).is_dir():
+            infiles.extend(sorted(glob.glob(str(Path(pattern) / "*.py"))))
+        elif glob.has_magic(pattern):
+            infiles.extend(sorted(glob.glob(pattern, recursive=True)))
+        else:
+            infiles.append(pattern)
+    if not infiles:
+        raise FileNotFoundError(f"No Python modules found for {infile}")
+    return infiles
+
+
+def load_problem(infile: str) -> type:
+    """Import a Python module by its path and return the first class
+    whose name ends with `Problem`
+
+    Args:
+        infile (str): Name of Python file containing both the Domain
+            and Problem class definitions.
     """
     # Import module
     p = Path(infile)
 
     spec = importlib.util.spec_from_file_location(p.stem, str(p.resolve()))
     module = importlib.util.module_from_spec(spec)
+    # Registering the module lets the classes be found by name, e.g.
+    # by the domain cache in `Domain.generate_domain_pddl`
+    sys.modules[spec.name] = module
     spec.loader.exec_module(module)
 
     #importlib.reload(module)  # there might be a better way for this
 
     problem_name = [attr for attr in dir(module)
                     if attr.endswith("Problem")][0]
-    Problem = getattr(module, problem_name)
-
-    p = Problem()
-    p.generate_domain_pddl(filename=domain)
-    p.generate_problem_pddl(filename=problem)
+    return getattr(module, problem_name)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,605 @@
+import sys
+import time
+import heapq
+from itertools import count
+from collections import namedtuple, defaultdict, deque
+import fire
+
+from .py2pddl import open_pddl, _atoms, _flatten
+from .ground import Grounder, GroundAction, ground_atom
+from .prune import _assign, _relevant
+from .symmetry import Symmetry
+from .parse import load_problem
+
+# Outcome of a search. `plan` is a list of steps as tuples of the action
+# name and its arguments, or None when the goal cannot be reached.
+SearchResult = namedtuple(
+    "SearchResult", ["plan", "expanded", "generated", "seconds"])
+
+SEARCHES = ("gbfs", "astar")
+HEURISTICS = ("ff", "add", "max")
+
+# Pops by which the queue of the successors reached by relaxed plan
+# actions gets ahead when GBFS finds a better heuristic value
+BOOST = 1000
+
+
+class Planner:
+    """Forward search planner for a problem instance
+
+    Only the ground actions that are reachable from :init when delete
+    effects are ignored, and relevant for the goal, are searched. They
+    are grounded forwards from :init, so an action is only grounded once
+    all of its preconditions can hold.
+
+    Atoms are numbered and a state is a Python integer used as a bitset,
+    as in `py2pddl.validate`, which is compact and hashes fast. Each
+    action is indexed by one of its precondition atoms, the one that the
+    fewest actions share, and the applicable actions of a state are found
+    by checking the full precondition mask of the actions indexed by the
+    atoms that hold.
+
+    The heuristics are computed on the delete relaxation: "add" sums the
+    costs of the goal atoms, "max" takes the largest one and is
+    admissible, and "ff" counts the actions of a relaxed plan extracted
+    from the "add" costs.
+
+    With `symmetry`, states that a symmetry of the objects maps to each
+    other are searched once. Each state is mapped to a canonical one by
+    applying the symmetries found by `Symmetry` while that makes the state
+    smaller, and a state is pruned when its canonical state has been
+    reached before, or with "gbfs", expanded before. Plans are still made
+    of the states actually reached.
+
+    Args:
+        problem (Domain): Instance of a subclassed Domain with its objects
+            created.
+        init (dict, optional): Keyword arguments for the `@init` method.
+        goal (dict, optional): Keyword arguments for the `@goal` method.
+        symmetry (bool, optional): Prune states that are symmetric to
+            states already reached. Defaults to False.
+    """
+
+    def __init__(self, problem, init: dict = None, goal: dict = None,
+                 symmetry: bool = False):
+        grounder = Grounder(problem, init)
+        goals = list(_flatten(_atoms(problem.goal, goal or {})))
+        targets = [ground_atom(atom) for atom in goals if not atom.negated]
+        avoid = [ground_atom(atom) for atom in goals if atom.negated]
+
+        actions = _reachable_actions(grounder)
+        reached = {atom for action in actions for atom in action.add}
+        reached.update(grounder.init)
+        self.solvable = all(atom in reached for atom in targets)
+        if not self.solvable:
+            actions = []
+        elif not avoid:
+            # Without negated goals, leaving out the actions that add
+            # nothing relevant keeps a plan. With them, an action may be
+            # needed to delete an atom.
+            _, relevant = _relevant(
+                targets, [(a.args, a.precond, a.add) for a in actions],
+                range(len(actions)))
+            actions = [actions[i] for i in sorted(relevant)]
+        self.actions = actions
+
+        self.atoms = []
+        self._ids = {}
+        # Static atoms and the :init atoms that no action uses never
+        # change, so they are left out of the states
+        used = {atom for action in actions
+                for atom in action.precond + action.add + action.delete}
+        used.update(targets)
+        used.update(avoid)
+        self.init = self.mask(atom for atom in grounder.init if atom in used)
+        self.goal = self.mask(targets)
+        self.avoid = self.mask(avoid)
+        self._goal_atoms = [self._ids[atom] for atom in targets]
+
+        self._pre_masks = [self.mask(action.precond) for action in actions]
+        self._add_masks = [self.mask(action.add) for action in actions]
+        self._del_masks = [self.mask(action.delete) for action in actions]
+        self._pre = [list(dict.fromkeys(self._ids[atom]
+                                        for atom in action.precond))
+                     for action in actions]
+        self._add = [[self._ids[atom] for atom in action.add]
+                     for action in actions]
+
+        # Actions by the atoms in their preconditions, for the heuristics,
+        # and by one precondition atom, for finding applicable actions
+        self._pre_of = [[] for _ in self.atoms]
+        for i, pre in enumerate(self._pre):
+            for atom in pre:
+                self._pre_of[atom].append(i)
+        self._free = [i for i, pre in enumerate(self._pre) if not pre]
+        self._index = defaultdict(list)
+        for i, pre in enumerate(self._pre):
+            if pre:
+                atom = min(pre, key=lambda atom: len(self._pre_of[atom]))
+                self._index[atom].append(i)
+
+        # Templates of the per-state lists of the heuristics
+        self._no_cost = [sys.maxsize] * len(self.atoms)
+        self._npre = [len(pre) for pre in self._pre]
+        self._no_acc = [0] * len(actions)
+
+        # Symmetries of the states and actions. Objects that can all be
+        # swapped with each other are handled together.
+        self._groups, self._symmetries = [], []
+        if symmetry and actions:
+            self._groups, self._symmetries = _state_symmetries(
+                self.atoms, self._ids,
+                Symmetry(problem, init, goal, fluents=False).generators)
+        # Object and pattern of the atoms of each group. An atom can be in
+        # several groups, e.g. (plane-at p1 sfo) of planes and airports.
+        self._in_group = [{i: (k, p) for k, row in enumerate(rows)
+                           for p, i in enumerate(row)}
+                          for rows in self._groups]
+        self._group_atoms = [set(in_group) for in_group in self._in_group]
+
+    def mask(self, atoms) -> int:
+        """Bitset of ground atoms"""
+        mask = 0
+        for atom in atoms:
+            i = self._ids.get(atom)
+            if i is None:
+                i = self._ids[atom] = len(self.atoms)
+                self.atoms.append(atom)
+            mask |= 1 << i
+        return mask
+
+    def applicable(self, state: int) -> list:
+        """Indices of the actions applicable in a state"""
+        result = list(self._free)
+        pre_masks = self._pre_masks
+        for atom in _bits(state):
+            for i in self._index.get(atom, ()):
+                if pre_masks[i] & state == pre_masks[i]:
+                    result.append(i)
+        return result
+
+    def successor(self, state: int, i: int) -> int:
+        return (state & ~self._del_masks[i]) | self._add_masks[i]
+
+    def is_goal(self, state: int) -> bool:
+        return state & self.goal == self.goal and not state & self.avoid
+
+    def canonical(self, state: int) -> int:
+        """A state symmetric to a state, which is the same for most states
+        that are symmetric to each other. The objects of each group of
+        objects that can all be swapped are sorted by the atoms they are
+        in, and the other symmetries are applied for as long as one makes
+        the sorted state smaller."""
+        atoms = self._sort_groups(set(_bits(state)))
+        improved = bool(self._symmetries)
+        while improved:
+            improved = False
+            for support, moves in self._symmetries:
+                moved = atoms & support
+                if not moved:
+                    continue
+                image = self._sort_groups(
+                    (atoms - moved) | {moves[i] for i in moved})
+                # The image is smaller if the largest atom that differs
+                # is not in it
+                changed = atoms ^ image
+                if changed and max(changed) in atoms:
+                    atoms = image
+                    improved = True
+
+        state = 0
+        for i in atoms:
+            state |= 1 << i
+        return state
+
+    def _sort_groups(self, atoms: set) -> set:
+        # Each group is sorted in turn, from the atoms left by the ones
+        # before, so that each step is a permutation of the objects of
+        # one group. Sorted by the patterns of the atoms that each object
+        # is in, the objects in some atom go last, as the others have the
+        # smallest pattern, which is none.
+        for rows, in_group, group_atoms in zip(
+                self._groups, self._in_group, self._group_atoms):
+            held = defaultdict(list)
+            removed = atoms & group_atoms
+            if not removed:
+                continue
+            for i in removed:
+                k, p = in_group[i]
+                held[k].append(p)
+            atoms.difference_update(removed)
+            found = sorted(sorted(patterns) if len(patterns) > 1
+                           else patterns for patterns in held.values())
+            for row, patterns in zip(rows[len(rows) - len(found):], found):
+                atoms.update(map(row.__getitem__, patterns))
+        return atoms
+
+    def heuristic(self, state: int, kind: str = "ff"):
+        """Estimated number of actions to reach the goal from a state,
+        or None if the goal cannot be reached even ignoring deletes
+
+        Args:
+            state (int): State as a bitset.
+            kind (str, optional): "ff", "add" or "max". Defaults to "ff".
+        """
+        if kind not in HEURISTICS:
+            raise ValueError(f"Unknown heuristic '{kind}'. Expected one of "
+                             f"{', '.join(HEURISTICS)}.")
+        return self._relaxed(state, kind)[0]
+
+    def search(self, algorithm: str = "gbfs", heuristic: str = "ff",
+               max_expansions: int = None) -> SearchResult:
+        """Search for a plan from :init
+
+        GBFS expands the state with the lowest heuristic value first. It
+        evaluates a state when expanding it rather than when generating
+        it, and tries the actions of the relaxed plan first. A* expands
+        the lowest sum of the plan length so far and the heuristic value,
+        and finds shortest plans with "max".
+
+        Args:
+            algorithm (str, optional): "gbfs" or "astar". Defaults to
+                "gbfs".
+            heuristic (str, optional): "ff", "add" or "max". Defaults to
+                "ff".
+            max_expansions (int, optional): Give up after expanding this
+                many states. Defaults to no limit.
+        """
+        if algorithm not in SEARCHES:
+            raise ValueError(f"Unknown search '{algorithm}'. Expected one of "
+                             f"{', '.join(SEARCHES)}.")
+        if heuristic not in HEURISTICS:
+            raise ValueError(f"Unknown heuristic '{heuristic}'. Expected one "
+                             f"of {', '.join(HEURISTICS)}.")
+        start = time.perf_counter()
+        search = self._astar if algorithm == "astar" else self._gbfs
+        plan, expanded, generated = search(heuristic, max_expansions)
+        return SearchResult(plan, expanded, generated,
+                            time.perf_counter() - start)
+
+    def _gbfs(self, heuristic: str, max_expansions: int) -> tuple:
+        # Parent state and action of each state reached. With symmetries,
+        # states are also closed by their canonical state, when they are
+        # evaluated, as most successors are never evaluated.
+        parents = {self.init: None}
+        canonical = (self.canonical if self._groups or self._symmetries
+                     else None)
+        closed, seen = set(), set()
+        expanded = generated = 0
+        tiebreak = count()
+
+        # Successors are queued by the heuristic value of their parent,
+        # and also in a second queue when reached by an action of the
+        # relaxed plan. The queue popped from least is popped next, and
+        # the second one gets ahead whenever the best value improves.
+        queues = ([(0, next(tiebreak), self.init)] if self.solvable else [],
+                  [])
+        popped = [0, 0]
+        best = None
+        while queues[0] or queues[1]:
+            k = 1 if queues[1] and (popped[1] <= popped[0]
+                                    or not queues[0]) else 0
+            popped[k] += 1
+            _, _, state = heapq.heappop(queues[k])
+            if state in closed:
+                continue
+            closed.add(state)
+            if canonical is not None:
+                key = canonical(state)
+                if key in seen:
+                    continue
+                seen.add(key)
+            if self.is_goal(state):
+                return self._plan(parents, state), expanded, generated
+            h, relaxed_plan = self._relaxed(state, heuristic)
+            if h is None:
+                continue
+            if best is None or h < best:
+                best = h
+                popped[1] -= BOOST
+            if max_expansions is not None and expanded >= max_expansions:
+                break
+            expanded += 1
+            for i in self.applicable(state):
+                succ = self.successor(state, i)
+                generated += 1
+                if succ in parents:
+                    continue
+                parents[succ] = (state, i)
+                entry = (h, next(tiebreak), succ)
+                heapq.heappush(queues[0], entry)
+                if i in relaxed_plan:
+                    heapq.heappush(queues[1], entry)
+        return None, expanded, generated
+
+    def _astar(self, heuristic: str, max_expansions: int) -> tuple:
+        # Plan lengths are kept by canonical state
+        canonical = (self.canonical if self._groups or self._symmetries
+                     else None)
+        key = self.init if canonical is None else canonical(self.init)
+        parents = {self.init: None}
+        lengths = {key: 0}
+        expanded = generated = 0
+        h = self._relaxed(self.init, heuristic)[0] if self.solvable else None
+        tiebreak = count()
+        queue = ([] if h is None
+                 else [(h, h, next(tiebreak), 0, key, self.init)])
+        while queue:
+            _, _, _, g, key, state = heapq.heappop(queue)
+            if g > lengths[key]:
+                # Stale entry of a state since reached by a shorter path
+                continue
+            if self.is_goal(state):
+                return self._plan(parents, state), expanded, generated
+            if max_expansions is not None and expanded >= max_expansions:
+                break
+            expanded += 1
+            for i in self.applicable(state):
+                succ = self.successor(state, i)
+                generated += 1
+                key = succ if canonical is None else canonical(succ)
+                if lengths.get(key, g + 2) <= g + 1:
+                    continue
+                lengths[key] = g + 1
+                parents[succ] = (state, i)
+                h = self._relaxed(succ, heuristic)[0]
+                if h is not None:
+                    heapq.heappush(queue, (g + 1 + h, h, next(tiebreak),
+                                           g + 1, key, succ))
+        return None, expanded, generated
+
+    def _relaxed(self, state: int, kind: str) -> tuple:
+        """Heuristic value of a state and the actions of the relaxed plan,
+        which is only extracted for "ff" and otherwise empty"""
+        # The costs are computed in flat lists indexed by atom and action
+        # ids, copied from templates, as this runs for every state
+        atoms = _bits(state)
+        cost = self._no_cost[:]
+        for atom in atoms:
+            cost[atom] = 0
+        remaining = self._npre[:]
+        acc = self._no_acc[:]
+        supporter = {}
+        goals = [atom for atom in self._goal_atoms if cost[atom]]
+        left = set(goals)
+        maximum = kind == "max"
+        pre_of, add = self._pre_of, self._add
+
+        # Costs are integers, so a list of buckets is the priority queue
+        buckets = [atoms]
+        for i in self._free:
+            for atom in add[i]:
+                if cost[atom] > 1:
+                    cost[atom] = 1
+                    supporter[atom] = i
+                    if len(buckets) == 1:
+                        buckets.append([])
+                    buckets[1].append(atom)
+        c = 0
+        while left and c < len(buckets):
+            for atom in buckets[c]:
+                if cost[atom] != c:
+                    continue
+                left.discard(atom)
+                for i in pre_of[atom]:
+                    remaining[i] -= 1
+                    if maximum:
+                        acc[i] = c
+                    else:
+                        acc[i] += c
+                    if remaining[i]:
+                        continue
+                    ca = acc[i] + 1
+                    for q in add[i]:
+                        if ca < cost[q]:
+                            cost[q] = ca
+                            supporter[q] = i
+                            while len(buckets) <= ca:
+                                buckets.append([])
+                            buckets[ca].append(q)
+            c += 1
+        if left:
+            return None, ()
+
+        if kind == "add":
+            return sum(cost[atom] for atom in goals), ()
+        if maximum:
+            return max((cost[atom] for atom in goals), default=0), ()
+        relaxed_plan = set()
+        stack = goals
+        while stack:
+            i = supporter.get(stack.pop())
+            if i is not None and i not in relaxed_plan:
+                relaxed_plan.add(i)
+                stack.extend(self._pre[i])
+        return len(relaxed_plan), relaxed_plan
+
+    def _plan(self, parents: dict, state: int) -> list:
+        steps = []
+        while parents[state] is not None:
+            state, i = parents[state]
+            steps.append((self.actions[i].name, *self.actions[i].args))
+        return steps[::-1]
+
+
+def _reachable_actions(grounder: Grounder) -> list:
+    """Ground actions whose preconditions can all hold when delete effects
+    are ignored, found forwards from :init. Preconditions on static
+    predicates are left out, as the grounder checks them."""
+    triggers = defaultdict(list)
+    for schema in grounder.schemas:
+        precond = [(pred, params) for pred, params in schema.precond
+                   if pred not in grounder.static]
+        for pred, params in precond:
+            triggers[pred].append((schema, params, precond))
+
+    reached = dict.fromkeys(grounder.init)
+    queue = deque(reached)
+    actions = {}
+
+    def ground(schema, precond, partial=None):
+        for args in grounder.assignments(schema, partial):
+            if (schema.name, args) in actions:
+                continue
+            pre = [(pred, *map(args.__getitem__, params))
+                   for pred, params in precond]
+            if not all(atom in reached for atom in pre):
+                continue
+            add = [(pred, *map(args.__getitem__, params))
+                   for pred, params in schema.add]
+            actions[schema.name, args] = GroundAction(
+                schema.name, args, pre, add,
+                [(pred, *map(args.__getitem__, params))
+                 for pred, params in schema.delete])
+            for atom in add:
+                if atom not in reached:
+                    reached[atom] = None
+                    queue.append(atom)
+
+    # An action is grounded when the last of its preconditions is reached
+    for schema in grounder.schemas:
+        if all(pred in grounder.static for pred, _ in schema.precond):
+            ground(schema, [])
+    while queue:
+        atom = queue.popleft()
+        for schema, params, precond in triggers.get(atom[0], ()):
+            partial = _assign(len(schema.params), params, atom[1:])
+            if partial is not None:
+                ground(schema, precond, partial)
+    return list(actions.values())
+
+
+def _state_symmetries(atoms: list, ids: dict, generators: list) -> tuple:
+    """Symmetries of the objects as symmetries of the states, for
+    `Planner.canonical`
+
+    Swaps join objects into groups in which any two objects can be
+    swapped. A group whose atoms each take only one of its objects is
+    given as the atoms of each object, in the same order, so that a state
+    is made canonical by sorting the objects. The other symmetries are
+    given as the atoms they move and where to. A symmetry that would move
+    an atom to one that is not searched is left out.
+    """
+    atoms_of = defaultdict(list)
+    for i, atom in enumerate(atoms):
+        for obj in set(atom[1:]):
+            atoms_of[obj].append(i)
+
+    parent = {}
+
+    def find(obj):
+        while parent.get(obj, obj) != obj:
+            obj = parent[obj]
+        return obj
+
+    swaps, others = defaultdict(list), []
+    for generator in generators:
+        if len(generator) == 2:
+            a, b = generator
+            parent[find(b)] = find(a)
+            swaps[find(a)].append(generator)
+        else:
+            others.append(generator)
+
+    groups = defaultdict(dict)
+    for found in swaps.values():
+        for generator in found:
+            for obj in generator:
+                groups[find(obj)][obj] = None
+    for root, group in groups.items():
+        group = {obj: None for obj in sorted(group)}
+        rows = {}
+        for k, obj in enumerate(group):
+            for i in atoms_of.get(obj, ()):
+                args = atoms[i][1:]
+                if any(arg in group and arg != obj for arg in args):
+                    rows = None
+                    break
+                pattern = (atoms[i][0],
+                           *[None if arg == obj else arg for arg in args])
+                rows.setdefault(pattern, [None] * len(group))[k] = i
+            if rows is None:
+                break
+        if rows and all(None not in row for row in rows.values()):
+            groups[root] = [tuple(row[k] for row in rows.values())
+                            for k in range(len(group))]
+        else:
+            groups[root] = None
+            others.extend(generator for key, found in swaps.items()
+                          if find(key) == root for generator in found)
+
+    symmetries = []
+    for generator in others:
+        moves = {}
+        for obj in generator:
+            for i in atoms_of.get(obj, ()):
+                moves[i] = ids.get((atoms[i][0], *[generator.get(arg, arg)
+                                                   for arg in atoms[i][1:]]))
+        if moves and None not in moves.values():
+            symmetries.append((set(moves), moves))
+    return [rows for rows in groups.values() if rows], symmetries
+
+
+def _bits(mask: int) -> list:
+    """Indices of the bits set in `mask`"""
+    bits = []
+    digits = bin(mask)[:1:-1]
+    i = digits.find("1")
+    while i != -1:
+        bits.append(i)
+        i = digits.find("1", i + 1)
+    return bits
+
+
+def write_plan(filename: str, plan: list):
+    """Write a plan in the format of Fast Downward's `sas_plan`, which
+    `py2pddl.validate.read_plan` reads"""
+    with open_pddl(filename, "w") as f:
+        for step in plan:
+            f.write("(" + " ".join(step) + ")\n")
+        f.write(f"; cost = {len(plan)} (unit cost)\n")
+
+
+def solve(infile: str,
+          plan_file: str = None,
+          algorithm: str = "gbfs",
+          heuristic: str = "ff",
+          init: dict = None,
+          goal: dict = None,
+          max_expansions: int = None,
+          symmetry: bool = False):
+    """Search for a plan for the problem of a Python module, and exit with
+    status 1 if none is found
+
+    Args:
+        infile (str): Name of Python file containing both the Domain
+            and Problem class definitions.
+        plan_file (str, optional): Write the plan to this file in the
+            format of Fast Downward's `sas_plan`. Defaults to printing it.
+        algorithm (str, optional): "gbfs" or "astar". Defaults to "gbfs".
+        heuristic (str, optional): "ff", "add" or "max". Defaults to "ff".
+        init (dict, optional): Keyword arguments for the `@init` method.
+        goal (dict, optional): Keyword arguments for the `@goal` method.
+        max_expansions (int, optional): Give up after expanding this many
+            states. Defaults to no limit.
+        symmetry (bool, optional): Prune states that are symmetric to
+            states already reached. Defaults to False.
+    """
+    planner = Planner(load_problem(infile)(), init, goal, symmetry)
+    result = planner.search(algorithm, heuristic, max_expansions)
+    if result.plan is None:
+        print(f"No plan found for {infile} after expanding {result.expanded} "
+              f"states in {result.seconds:.3f}s.")
+        raise SystemExit(1)
+
+    if plan_file is None:
+        for step in result.plan:
+            print("(" + " ".join(step) + ")")
+    else:
+        write_plan(plan_file, result.plan)
+    print(f"Plan with {len(result.plan)} steps found for {infile} after "
+          f"expanding {result.expanded} states in {result.seconds:.3f}s.")
+
+
+if __name__ == "__main__":
+    fire.Fire(solve)
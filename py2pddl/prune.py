@@ -0,0 +1,179 @@
+from collections import defaultdict, deque
+
+from .py2pddl import _atoms, _flatten
+from .ground import Grounder, ground_atom, _object_name
+
+
+class Relevance:
+    """Objects and :init atoms of a problem instance that can matter for
+    reaching its goal
+
+    Going backwards from the goal, an atom is relevant if it is a goal
+    atom or a precondition of a relevant action, and an action is
+    relevant if it adds a relevant atom and is reachable from :init when
+    delete effects are ignored. Objects are relevant if a relevant action
+    or a goal atom takes them as arguments. Only the actions that add an
+    atom found backwards from the goal are ever grounded.
+
+    Dropping the other objects and :init atoms keeps every plan made of
+    relevant actions valid, so a solvable problem stays solvable. When
+    the goal is not reachable, nothing is dropped.
+
+    Args:
+        problem (Domain): Instance of a subclassed Domain with its objects
+            created.
+        init (dict, optional): Keyword arguments for the `@init` method.
+        goal (dict, optional): Keyword arguments for the `@goal` method.
+    """
+
+    def __init__(self, problem, init: dict = None, goal: dict = None):
+        grounder = Grounder(problem, init)
+        goals = list(_flatten(_atoms(problem.goal, goal or {})))
+        targets = [ground_atom(atom) for atom in goals if not atom.negated]
+
+        # Every reachable achiever of a relevant atom is among these
+        # actions, so reachability can be computed over them only
+        actions = _achievers(grounder, targets)
+        reachable = _reachable(grounder.init, actions)
+        self.goal_reachable = all(atom in reachable[0] for atom in targets)
+
+        objects = list(dict.fromkeys(
+            name for names in grounder.objects.values() for name in names))
+        if self.goal_reachable:
+            self.atoms, relevant_actions = _relevant(targets, actions,
+                                                     reachable[1])
+            self.objects = {_object_name(str(arg))
+                            for atom in goals for arg in atom.args}
+            for i in relevant_actions:
+                self.objects.update(actions[i][0])
+        else:
+            self.atoms = set(grounder.init)
+            self.objects = set(objects)
+
+        self.removed_objects = [name for name in objects
+                                if name not in self.objects]
+        self.removed_atoms = [atom for atom in grounder.init
+                              if atom not in self.atoms]
+
+    def keeps(self, atom) -> bool:
+        """Whether an :init atom is kept. Negated atoms are kept when all
+        their objects are."""
+        if atom.negated:
+            return all(_object_name(str(arg)) in self.objects
+                       for arg in atom.args)
+        return ground_atom(atom) in self.atoms
+
+    def filter(self, atoms):
+        """Iterate over the atoms that are kept, with batches expanded"""
+        return filter(self.keeps, _flatten(atoms))
+
+    def summary(self) -> str:
+        if not self.goal_reachable:
+            return "The goal is not reachable. Nothing was pruned."
+        return (f"Pruned {len(self.removed_objects)} objects and "
+                f"{len(self.removed_atoms)} :init atoms that are irrelevant "
+                "to the goal.")
+
+
+def _achievers(grounder: Grounder, targets: list) -> list:
+    """Ground actions, with all their preconditions, that add one of
+    `targets` or, recursively, one of the preconditions of these actions"""
+    adders = defaultdict(list)
+    for schema in grounder.schemas:
+        for pred, params in schema.add:
+            adders[pred].append((schema, params))
+
+    actions = {}
+    seen = set(targets)
+    stack = list(targets)
+    # Partial assignments already grounded. Once a schema is grounded
+    # without any assignment, e.g. for (handempty), all of its actions are.
+    done = set()
+    while stack:
+        atom = stack.pop()
+        for schema, params in adders.get(atom[0], ()):
+            partial = _assign(len(schema.params), params, atom[1:])
+            if (partial is None or (schema.name, partial) in done
+                    or (schema.name, None) in done):
+                continue
+            done.add((schema.name, partial if any(partial) else None))
+            for args in grounder.assignments(schema, partial):
+                if (schema.name, args) in actions:
+                    continue
+                precond = {(pred, *map(args.__getitem__, atom_params))
+                           for pred, atom_params in schema.precond}
+                add = [(pred, *map(args.__getitem__, atom_params))
+                       for pred, atom_params in schema.add]
+                actions[schema.name, args] = (args, precond, add)
+                for atom in precond.difference(seen):
+                    seen.add(atom)
+                    stack.append(atom)
+    return list(actions.values())
+
+
+def _assign(n: int, params: tuple, objs: tuple) -> tuple:
+    """Objects assigned to `n` parameters so that the atom with the
+    parameters `params` has the arguments `objs`, with None for the
+    other parameters, or None if there is no such assignment"""
+    if len(params) != len(objs):
+        return None
+    partial = [None] * n
+    for param, obj in zip(params, objs):
+        if partial[param] not in (None, obj):
+            return None
+        partial[param] = obj
+    return tuple(partial)
+
+
+def _reachable(init, actions: list) -> tuple:
+    """Atoms and indices of actions reachable from `init` when delete
+    effects are ignored"""
+    reached = set(init)
+    queue = deque(reached)
+    waiting = defaultdict(list)
+    remaining = []
+    fired = []
+
+    def fire(i):
+        fired.append(i)
+        for atom in actions[i][2]:
+            if atom not in reached:
+                reached.add(atom)
+                queue.append(atom)
+
+    for i, (_, precond, _) in enumerate(actions):
+        missing = [atom for atom in precond if atom not in reached]
+        remaining.append(len(missing))
+        for atom in missing:
+            waiting[atom].append(i)
+        if not missing:
+            fire(i)
+
+    while queue:
+        for i in waiting.pop(queue.popleft(), ()):
+            remaining[i] -= 1
+            if remaining[i] == 0:
+                fire(i)
+    return reached, fired
+
+
+def _relevant(targets: list, actions: list, reachable: list) -> tuple:
+    """Atoms and indices of actions relevant for `targets`"""
+    adders = defaultdict(list)
+    for i in reachable:
+        for atom in actions[i][2]:
+            adders[atom].append(i)
+
+    relevant = set(targets)
+    relevant_actions = set()
+    stack = list(relevant)
+    while stack:
+        for i in adders.get(stack.pop(), ()):
+            if i in relevant_actions:
+                continue
+            relevant_actions.add(i)
+            for atom in actions[i][1]:
+                if atom not in relevant:
+                    relevant.add(atom)
+                    stack.append(atom)
+    return relevant, relevant_actions
@@ -1,9 +1,53 @@
+import io
+import sys
+import gzip
+import lzma
+import time
 import inspect
+import hashlib
+import tracemalloc
+from pathlib import Path
 from functools import wraps
-from collections import UserString, UserDict, defaultdict
+from contextlib import contextmanager
+from weakref import WeakKeyDictionary
+from itertools import islice
+from collections import UserString, UserDict, defaultdict, namedtuple
+from collections.abc import Iterator
 
 # pylint:disable=invalid-name
 
+# Rendered domain PDDL of each Domain subclass
+_domain_cache = WeakKeyDictionary()
+
+# Compiled action schemas of each Domain subclass, by `@action` wrapper
+_schema_cache = WeakKeyDictionary()
+
+# Size of the file buffer and number of atoms rendered per write
+# when streaming a problem file
+BUFFER_SIZE = 1 << 20
+CHUNK_SIZE = 4096
+
+# Compression of PDDL files, by extension
+COMPRESSION = {".gz": "gzip", ".xz": "xz"}
+
+# Measurements of one phase of generating a domain or problem file,
+# reported by `Domain.profile`. `atoms` and `bytes` are None for the
+# phases where they do not apply, and `peak_bytes` is None when memory
+# is not traced.
+PhaseStats = namedtuple(
+    "PhaseStats", ["phase", "seconds", "atoms", "bytes", "peak_bytes"])
+
+# An `@action` compiled once per Domain subclass. Each atom of `precond`
+# (positive preconditions), `negative` (negative preconditions), `add` and
+# `delete` is a pair of the predicate name and a tuple of the indices of
+# the action parameters it takes as arguments. `preconditions` and
+# `effects` are all the literals in the order they were written, as
+# triples of the predicate name, the parameter indices and whether the
+# literal is negated.
+ActionSchema = namedtuple(
+    "ActionSchema", ["name", "params", "types", "precond", "negative",
+                     "add", "delete", "preconditions", "effects"])
+
 
 def create_type(name, Base=None) -> type:
     if Base:
@@ -25,12 +69,83 @@ def create_type(name, Base=None) -> type:
 
 class PDDLString(UserString):
     def __invert__(self):
-        if "|" in self.data:
-            a, b, c = self.data.split(" | ")
-            a, b, c = PDDLString(a), PDDLString(b), PDDLString(c)
-            return ~a + " | " + ~b + " | " + ~c
-        else:
-            return f"(not {self.data})"
+        return f"(not {self.data})"
+
+
+class Atom:
+    """A predicate applied to a tuple of arguments. Nothing is
+    formatted until the atom is rendered, which is once at emit time.
+    """
+    __slots__ = ("name", "args", "negated")
+
+    def __init__(self, name: str, args: tuple, negated: bool = False):
+        self.name = name
+        self.args = args
+        self.negated = negated
+
+    def __invert__(self):
+        return Atom(self.name, self.args, not self.negated)
+
+    def __eq__(self, other):
+        if not isinstance(other, Atom):
+            return NotImplemented
+        return (self.name == other.name and self.args == other.args
+                and self.negated == other.negated)
+
+    def __hash__(self):
+        return hash((self.name, self.args, self.negated))
+
+    def __repr__(self):
+        return f"Atom({self.render()!r})"
+
+    def __str__(self):
+        return self.render()
+
+    def render(self, variables: bool = False) -> str:
+        """
+        Args:
+            variables (bool, optional): Render the arguments as `?x`
+                variables, as in the :precondition and :effect of an
+                action. Defaults to False.
+        """
+        prefix = "?" if variables else ""
+        args = [prefix + str(arg).replace("_", "-") for arg in self.args]
+        atom = "(" + " ".join([self.name, *args]) + ")"
+        if self.negated:
+            return f"(not {atom})"
+        return atom
+
+
+class AtomBatch:
+    """Many atoms of one predicate, stored as one column of object names
+    per argument. Created by the `many` method of a predicate.
+    """
+    __slots__ = ("name", "columns", "negated")
+
+    def __init__(self, name: str, columns: tuple, negated: bool = False):
+        self.name = name
+        self.columns = columns
+        self.negated = negated
+
+    def __invert__(self):
+        return AtomBatch(self.name, self.columns, not self.negated)
+
+    def __len__(self):
+        return len(self.columns[0]) if self.columns else 0
+
+    def __iter__(self):
+        for args in zip(*self.columns):
+            yield Atom(self.name, args, self.negated)
+
+    def __repr__(self):
+        return f"AtomBatch({self.name!r}, {len(self)} atoms)"
+
+    def render(self) -> str:
+        """Render all atoms, separated by spaces, with a single join"""
+        fmt = "(" + " ".join([self.name] + ["{}"] * len(self.columns)) + ")"
+        if self.negated:
+            fmt = f"(not {fmt})"
+        return " ".join(map(fmt.format, *self.columns)).replace("_", "-")
 
 
 class PDDLDict(UserDict):
@@ -47,53 +162,587 @@ class PDDLDict(UserDict):
             return self.data[key]
 
 
+class PDDLObjects:
+    """Objects of one type created by `create_objs`. Only the object names
+    are stored; each object is identified by its position (its id) and the
+    typed object is created when it is looked up.
+    """
+    __slots__ = ("Type", "typ", "names", "_keys")
+
+    def __init__(self, Type, keys, names: list):
+        self.Type = Type
+        self.typ = _type_name(Type)
+        self.names = names
+        # A range maps keys to ids arithmetically, anything else by a dict
+        if isinstance(keys, range):
+            self._keys = keys
+        else:
+            self._keys = {key: i for i, key in enumerate(keys)}
+
+    def id(self, key) -> int:
+        """Id of the object with the alias `key`"""
+        try:
+            if isinstance(self._keys, range):
+                return self._keys.index(key)
+            return self._keys[key]
+        except (KeyError, ValueError, TypeError):
+            raise KeyError(
+                f"Key '{key}' does not exist for {self.typ}. "
+                "Have you defined the objects correctly?") from None
+
+    def obj(self, i: int):
+        """Typed object with the id `i`"""
+        obj = self.Type.__new__(self.Type)
+        obj.data = self.names[i]
+        return obj
+
+    def __getitem__(self, key):
+        return self.obj(self.id(key))
+
+    def __contains__(self, key):
+        try:
+            self.id(key)
+        except KeyError:
+            return False
+        return True
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __repr__(self):
+        return f"PDDLObjects({self.typ}, {len(self)} objects)"
+
+    def keys(self):
+        return iter(self._keys)
+
+    def take(self, ids) -> "ObjectColumn":
+        """Select objects by their ids, e.g. for a predicate's `many`
+
+        Args:
+            ids (sequence of int): Object ids, e.g. a list, range or a
+                NumPy integer array.
+        """
+        return ObjectColumn(self, ids)
+
+    def values(self):
+        return map(self.obj, range(len(self)))
+
+    def items(self):
+        return zip(self._keys, self.values())
+
+
+class ObjectColumn:
+    """Objects of a `PDDLObjects` collection selected by their ids"""
+    __slots__ = ("objects", "ids")
+
+    def __init__(self, objects: PDDLObjects, ids):
+        self.objects = objects
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def names(self) -> list:
+        ids = self.ids.tolist() if hasattr(self.ids, "tolist") else self.ids
+        return list(map(self.objects.names.__getitem__, ids))
+
+
+class _Phase:
+    """Counts filled in by the code running a phase, and whether the
+    phase is being profiled at all"""
+    __slots__ = ("active", "atoms", "bytes")
+
+    def __init__(self, active: bool):
+        self.active = active
+        self.atoms = None
+        self.bytes = None
+
+
+class _CountingWriter:
+    """Text file object counting the UTF-8 bytes written to `f`"""
+    __slots__ = ("f", "bytes")
+
+    def __init__(self, f):
+        self.f = f
+        self.bytes = 0
+
+    def write(self, text: str):
+        self.bytes += len(text.encode("utf-8"))
+        return self.f.write(text)
+
+    def flush(self):
+        self.f.flush()
+
+
+class TypeIndex:
+    """Hierarchy of the types of a domain, built once per Domain subclass
+
+    Types are numbered in declaration order. The ancestors and descendants
+    of each type, including the type itself, are precomputed as sets of
+    these numbers, so a subtype check is a set lookup instead of
+    `issubclass` through ABCMeta.
+
+    Args:
+        types (dict): Types keyed on their attribute names, as in the
+            registry of the domain.
+    """
+
+    def __init__(self, types: dict):
+        self.types = list(types.values())
+        self.names = [vars(Type).get("_pddl_name") or attr.lower()
+                      for attr, Type in types.items()]
+        self.ids = {Type: i for i, Type in enumerate(self.types)}
+        self.by_name = {_type_name(Type): Type for Type in self.types}
+
+        # The parent of a type is its closest base class that is a type
+        # of the domain
+        self.parents = []
+        for Type in self.types:
+            parents = [self.ids[Base] for Base in Type.__mro__[1:]
+                       if Base in self.ids]
+            self.parents.append(parents[0] if parents else None)
+
+        ancestors = []
+        for i in range(len(self.types)):
+            ancestors.append({i})
+            parent = self.parents[i]
+            while parent is not None:
+                ancestors[i].add(parent)
+                parent = self.parents[parent]
+        descendants = [set() for _ in self.types]
+        for i, ids in enumerate(ancestors):
+            for j in ids:
+                descendants[j].add(i)
+        self.ancestors = [frozenset(ids) for ids in ancestors]
+        self.descendants = [frozenset(ids) for ids in descendants]
+
+    def id(self, Type) -> int:
+        return self.ids[Type]
+
+    def is_subtype(self, Type, Base) -> bool:
+        """Whether `Type` is `Base` or one of its subtypes. Classes that
+        are not types of the domain are checked with `issubclass`."""
+        i = self.ids.get(Type)
+        j = self.ids.get(Base)
+        if i is None or j is None:
+            return issubclass(Type, Base)
+        return j in self.ancestors[i]
+
+    def supertypes(self, Type) -> list:
+        """`Type` and its ancestors, in declaration order"""
+        return [self.types[i] for i in sorted(self.ancestors[self.ids[Type]])]
+
+    def subtypes(self, Type) -> list:
+        """`Type` and its descendants, in declaration order"""
+        return [self.types[i]
+                for i in sorted(self.descendants[self.ids[Type]])]
+
+    def section(self) -> str:
+        """The :types section of the domain, with the types grouped by
+        parent"""
+        children = defaultdict(list)
+        roots = []
+        for Type, name in zip(self.types, self.names):
+            # Assume client code only subclasses from one type
+            base = Type.__bases__[0]
+            if base is UserString:
+                roots.append(name)
+            else:
+                children[_type_name(base)].append(name)
+
+        lines = [f"\t\t{' '.join(names)} - {parent}"
+                 for parent, names in children.items()]
+        lines += [f"\t\t{name}" for name in roots if name not in children]
+        return "\n".join(["\t(:types", "\n".join(lines), "\t)"])
+
+
 class Domain:
 
+    # Types, predicates and actions of the class in declaration order,
+    # keyed on their section and then on their attribute name
+    _registry = {"types": {}, "predicate": {}, "action": {}}
+    _types = TypeIndex({})
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        # Inherit the entries of the base classes first so that they
+        # come before the ones declared in this class
+        registry = {section: {} for section in Domain._registry}
+        for base in reversed(cls.__mro__[1:]):
+            for section, entries in base.__dict__.get("_registry", {}).items():
+                registry[section].update(entries)
+
+        for name, attr in cls.__dict__.items():
+            for entries in registry.values():
+                entries.pop(name, None)
+            section = getattr(attr, "section", None)
+            if isinstance(section, str) and section in registry:
+                registry[section][name] = attr
+
+        cls._registry = registry
+        cls._types = TypeIndex(registry["types"])
+        # `many` is called without the instance, so the predicates keep
+        # the type index. A type has the same subtypes in every domain.
+        for fn in registry["predicate"].values():
+            fn.type_index = cls._types
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+
+        # Keep track of the object collections in assignment order
+        if not name.startswith("_"):
+            objects = self.__dict__.setdefault("_objects", {})
+            if isinstance(value, (list, PDDLDict, PDDLObjects)):
+                objects[name] = value
+            else:
+                objects.pop(name, None)
+
     def init(self):
         pass
 
     def goal(self):
         pass
 
-    def generate_domain_pddl(self, *, filename="domain"):
-        filename = filename + ".pddl"
-        hder = self._generate_header_domain()
-        reqs = Domain._generate_requirements()
-        typs = self._generate_types()
-        prds = self._generate_predicates()
-        acts = self._generate_actions()
-
-        pddl = "\n".join([hder, reqs, typs, prds, acts, ")"])
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write(str(pddl))
+    def generate_domain_pddl(self, *,
+                             filename: str = "domain",
+                             verbose: bool = True,
+                             cache_dir: str = None,
+                             compression: str = None):
+        """
+        Args:
+            filename (str, optional): Base name of domain PDDL file.
+                Defaults to "domain". A name ending with ".gz" or ".xz"
+                is used as it is and the file is compressed accordingly.
+            verbose (bool, optional): Print the name of the written file.
+                Defaults to True.
+            cache_dir (str, optional): Directory in which the rendered
+                domain is also kept across processes, keyed on a hash of
+                the source of the module defining the class. The domain
+                is always cached in memory for the lifetime of the class.
+                Defaults to None.
+            compression (str, optional): "gzip" or "xz" to compress the
+                file, which gets the extension ".pddl.gz" or ".pddl.xz".
+                Defaults to None.
+        """
+        filename = _pddl_filename(filename, compression)
+        pddl = self._render_domain(cache_dir)
+
+        with self._phase("write domain") as phase:
+            with open_pddl(filename, "w") as f:
+                f.write(pddl)
+            phase.bytes = len(pddl.encode("utf-8"))
+        if verbose:
             print(f"Domain PDDL written to {filename}.")
 
     def generate_problem_pddl(self, *,
                               init: dict = None,
                               goal: dict = None,
-                              filename: str = "problem"):
+                              filename: str = "problem",
+                              stream: bool = False,
+                              verbose: bool = True,
+                              compression: str = None,
+                              prune: bool = False,
+                              store=None):
+        """
+        Args:
+            init (dict, optional): Keyword arguments for the `@init` method.
+            goal (dict, optional): Keyword arguments for the `@goal` method.
+            filename (str, optional): Base name of problem PDDL file.
+                Defaults to "problem". A name ending with ".gz" or ".xz"
+                is used as it is and the file is compressed accordingly.
+            stream (bool, optional): Write the :init and :goal atoms to
+                the file as they are produced instead of building the
+                whole text in memory first. Use this with `@init` and
+                `@goal` methods that `yield` their atoms. Defaults to False.
+            verbose (bool, optional): Print the name of the written file.
+                Defaults to True.
+            compression (str, optional): "gzip" or "xz" to compress the
+                file, which gets the extension ".pddl.gz" or ".pddl.xz".
+                Compressed files are always streamed. Defaults to None.
+            prune (bool, optional): Leave out the objects and :init atoms
+                that are irrelevant to the goal. See `py2pddl.prune`.
+                Defaults to False.
+            store (FactStore, optional): Write the objects and :init atoms
+                of this store instead of the ones of the instance, which
+                is always streamed. See `py2pddl.store`. Defaults to None.
+
+        Returns:
+            Relevance: What was kept and removed when `prune` is set,
+                otherwise None.
+        """
         if init is None:
             init = {}
         if goal is None:
             goal = {}
-        filename = filename + ".pddl"
-
-        hder = self._generate_header_prob()
-        objs = self._generate_objects()
-        inits = "\t" + self.init(**init)
-        goals = "\t" + self.goal(**goal)
-
-        pddl = join([hder, objs, inits, goals, ")\n"],
-                    "\n", and_marker=False)
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write(str(pddl))
+        filename = _pddl_filename(filename, compression)
+
+        relevant = None
+        if prune and store is not None:
+            raise ValueError("A problem written from a store cannot be pruned")
+        if prune:
+            # Imported here as the pruning is built on this module
+            from .prune import Relevance  # pylint:disable=import-outside-toplevel
+            with self._phase("prune"):
+                relevant = Relevance(self, init, goal)
+            if verbose:
+                print(relevant.summary())
+
+        if stream or store is not None or Path(filename).suffix in COMPRESSION:
+            with open_pddl(filename, "w") as f:
+                self.write_problem(f, init=init, goal=goal, relevant=relevant,
+                                   store=store)
+            if verbose:
+                print(f"Problem PDDL written to {filename}.")
+            return relevant
+
+        pddl = self._render_problem(init, goal, relevant)
+        with self._phase("write problem") as phase:
+            with open(filename, "w", encoding="utf-8") as f:
+                f.write(pddl)
+                phase.bytes = f.tell()
+        if verbose:
             print(f"Problem PDDL written to {filename}.")
+        return relevant
+
+    def render_domain(self, *,
+                      cache_dir: str = None,
+                      encoding: str = None):
+        """Domain PDDL as a string, without writing a file
+
+        Args:
+            cache_dir (str, optional): See `generate_domain_pddl`.
+            encoding (str, optional): Return the text encoded as bytes
+                with this encoding, e.g. "utf-8". Defaults to None.
+        """
+        pddl = self._render_domain(cache_dir)
+        return pddl if encoding is None else pddl.encode(encoding)
+
+    def render_problem(self, *,
+                       init: dict = None,
+                       goal: dict = None,
+                       encoding: str = None,
+                       relevant=None):
+        """Problem PDDL as a string, without writing a file
+
+        Args:
+            init (dict, optional): Keyword arguments for the `@init` method.
+            goal (dict, optional): Keyword arguments for the `@goal` method.
+            encoding (str, optional): Return the text encoded as bytes
+                with this encoding, e.g. "utf-8". Defaults to None.
+            relevant (Relevance, optional): Only render the objects and
+                :init atoms it keeps. See `py2pddl.prune`.
+        """
+        pddl = self._render_problem(init or {}, goal or {}, relevant)
+        return pddl if encoding is None else pddl.encode(encoding)
+
+    def write_domain(self, f, *, cache_dir: str = None):
+        """Write the domain PDDL to a text file object, e.g. `sys.stdout`
+
+        Args:
+            f (file): Text file object.
+            cache_dir (str, optional): See `generate_domain_pddl`.
+        """
+        pddl = self._render_domain(cache_dir)
+        with self._phase("write domain") as phase:
+            f.write(pddl)
+            phase.bytes = len(pddl.encode("utf-8"))
+
+    def write_problem(self, f, *,
+                      init: dict = None,
+                      goal: dict = None,
+                      relevant=None,
+                      store=None):
+        """Write the problem PDDL to a text file object as the :init and
+        :goal atoms are produced, without building the whole text first
+
+        Args:
+            f (file): Text file object.
+            init (dict, optional): Keyword arguments for the `@init` method.
+            goal (dict, optional): Keyword arguments for the `@goal` method.
+            relevant (Relevance, optional): Only write the objects and
+                :init atoms it keeps. See `py2pddl.prune`.
+            store (FactStore, optional): Write the objects and :init atoms
+                of this store instead. See `py2pddl.store`.
+        """
+        if store is not None:
+            with self._phase("objects") as phase:
+                if phase.active:
+                    f = _CountingWriter(f)
+                f.write(self._generate_header_prob() + "\n")
+                phase.atoms = store.write_objects(f)
+            with self._phase("init") as phase:
+                f.write("\n\t(:init ")
+                phase.atoms = store.write_init(f)
+            self._write_goal(f, goal)
+            return
+
+        with self._phase("objects") as phase:
+            hder = self._generate_header_prob()
+            objs = self._generate_objects(relevant)
+            phase.atoms = self._count_objects()
+            if phase.active:
+                f = _CountingWriter(f)
+
+        # Atoms are written as they are produced, so these phases
+        # include running the method, rendering and writing
+        with self._phase("init") as phase:
+            f.write(hder + "\n" + objs + "\n\t(:init ")
+            inits = _atoms(self.init, init or {})
+            if relevant is not None:
+                inits = relevant.filter(inits)
+            phase.atoms = _write_atoms(f, inits, and_marker=False)
+            # Free the :init atoms before the `@goal` method runs
+            del inits
+        self._write_goal(f, goal)
+
+    def _write_goal(self, f, goal: dict):
+        with self._phase("goal") as phase:
+            f.write(")\n\t(:goal ")
+            phase.atoms = _write_atoms(f, _atoms(self.goal, goal or {}))
+        with self._phase("write problem") as phase:
+            f.write(")\n)\n")
+            f.flush()
+            if phase.active:
+                phase.bytes = f.bytes
+
+    @contextmanager
+    def profile(self, callback=None, memory: bool = True):
+        """Measure the phases of generating the domain and problem files
+        within a `with` block, e.g.
+
+            with p.profile() as stats:
+                p.generate_domain_pddl()
+                p.generate_problem_pddl()
+
+        Each phase is reported as a `PhaseStats` with its duration, the
+        number of atoms it produced, the bytes it wrote and the peak
+        memory it allocated. The phases are "types", "predicates",
+        "actions" and "join domain" when the domain is rendered (it is
+        cached afterwards), "objects", "init", "render init", "goal",
+        "render goal" and "join problem" when the problem is rendered,
+        and "write domain" and "write problem".
+
+        Args:
+            callback (callable, optional): Called with the `PhaseStats`
+                of each phase as soon as it ends. Defaults to None.
+            memory (bool, optional): Trace the peak memory of each phase
+                with tracemalloc, which slows down allocations.
+                Defaults to True.
+        """
+        stats = []
+        tracing = memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        self._profiler = (stats, callback, memory)
+        try:
+            yield stats
+        finally:
+            del self._profiler
+            if tracing:
+                tracemalloc.stop()
+
+    def _render_problem(self, init: dict, goal: dict, relevant=None) -> str:
+        with self._phase("objects") as phase:
+            hder = self._generate_header_prob()
+            objs = self._generate_objects(relevant)
+            phase.atoms = self._count_objects()
+
+        # The methods are run and their atoms rendered in separate phases.
+        # The atoms are popped off `atoms` so that the rendering functions
+        # hold the only reference and can free them as they go.
+        atoms = []
+        with self._phase("init") as phase:
+            atoms.append(_atom_list(_atoms(self.init, init)))
+            if relevant is not None:
+                atoms[0] = list(relevant.filter(atoms[0]))
+            if phase.active:
+                phase.atoms = _count(atoms[0])
+        with self._phase("render init"):
+            inits = "\t" + _render_init(atoms.pop())
+        with self._phase("goal") as phase:
+            atoms.append(_atom_list(_atoms(self.goal, goal)))
+            if phase.active:
+                phase.atoms = _count(atoms[0])
+        with self._phase("render goal"):
+            goals = "\t" + _render_goal(atoms.pop())
+
+        with self._phase("join problem"):
+            return join([hder, objs, inits, goals, ")\n"],
+                        "\n", and_marker=False)
+
+    def _render_domain(self, cache_dir: str = None) -> str:
+        # The domain only depends on the class, not on the instance
+        cls = self.__class__
+        if cls in _domain_cache:
+            return _domain_cache[cls]
+
+        path = None
+        if cache_dir is not None:
+            digest = _source_hash(cls)
+            if digest is not None:
+                path = Path(cache_dir) / f"{cls.__qualname__}-{digest}.pddl"
+        if path is not None and path.exists():
+            pddl = path.read_text(encoding="utf-8")
+        else:
+            hder = self._generate_header_domain()
+            reqs = Domain._generate_requirements()
+            with self._phase("types") as phase:
+                typs = self._generate_types()
+                phase.atoms = len(self._registry["types"])
+            with self._phase("predicates") as phase:
+                prds = self._generate_predicates()
+                phase.atoms = len(self._registry["predicate"])
+            with self._phase("actions") as phase:
+                acts = self._generate_actions()
+                phase.atoms = len(self._registry["action"])
+            with self._phase("join domain"):
+                pddl = "\n".join([hder, reqs, typs, prds, acts, ")"])
+
+            if path is not None:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(pddl, encoding="utf-8")
+
+        _domain_cache[cls] = pddl
+        return pddl
+
+    @contextmanager
+    def _phase(self, name: str):
+        # Nothing is measured unless the phase runs within `profile`
+        profiler = self.__dict__.get("_profiler")
+        phase = _Phase(profiler is not None)
+        if profiler is None:
+            yield phase
+            return
+
+        stats, callback, memory = profiler
+        if memory:
+            # Without `reset_peak` (Python < 3.9) the peak is since the
+            # start of `profile`
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        yield phase
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] - current if memory else None
+
+        stats.append(PhaseStats(name, seconds, phase.atoms, phase.bytes, peak))
+        if callback is not None:
+            callback(stats[-1])
+
+    def _count_objects(self) -> int:
+        return sum(len(objs)
+                   for objs in self.__dict__.get("_objects", {}).values())
 
     def _generate_header_domain(self):
         cls = self.__class__
         while cls.__bases__[0] != Domain:
             cls = cls.__bases__[0]
-        name = cls.__name__.lower().replace("domain", "")
+        name = _header_name(cls, "domain")
         return f"(define\n\t(domain {name})"
 
     def _generate_header_prob(self):
@@ -102,8 +751,8 @@ class Domain:
             raise RuntimeError("Unable to generate the problem header. "
                                "Call `generate_problem_pddl` from an instance "
                                "of a subclassed Domain.")
-        domain_name = cls.__bases__[0].__name__.lower().replace("domain", "")
-        problem_name = cls.__name__.lower().replace("problem", "")
+        domain_name = _header_name(cls.__bases__[0], "domain")
+        problem_name = _header_name(cls, "problem")
         return f"(define\n\t(problem {problem_name})" + "\n\t" + f"(:domain {domain_name})"
 
     @staticmethod
@@ -111,195 +760,161 @@ class Domain:
         return "\t(:requirements :strips :typing)"
 
     def _generate_types(self):
-        # Keep track of hierarchical types using `types_dict`
-        # and types with possibly no children using `types_list`
-        types_dict = defaultdict(list)
-        types_list = []
-
-        # Update `types_dict`
-        for attr_name in dir(self):
-            attr = getattr(self, attr_name)
-            if hasattr(attr, "section") and attr.section == "types":
-                # Assume client code only subclasses from one type
-                base = attr.__bases__[0]
-                base_name = base.__name__.lower()
-                if base == UserString:
-                    types_list.append(attr_name.lower())
-                else:
-                    types_dict[base_name].append(attr_name.lower())
-
-        # Update `types_list`
-        for typ in types_list:
-            if typ in types_dict:
-                types_list.remove(typ)
-
-        section_types = []
-        for parent, children in types_dict.items():
-            section_types.append(f"\t\t{' '.join(children)} - {parent}")
-        for typ in types_list:
-            section_types.append(f"\t\t{typ}")
-        section_types = "\n".join(section_types)
-        section_types = "\n".join(["\t(:types", section_types, "\t)"])
-
-        return section_types
+        return self._types.section()
 
     def _generate_predicates(self):
         predicates = "\n".join([
-            "\t\t" + fn().split(" | ")[0]
+            "\t\t" + fn.declaration
             for fn in self._get("predicate")
         ])
         return "\n".join(["\t(:predicates", predicates, "\t)"])
 
     def _generate_actions(self):
-        actions = "\n".join([
-            "\t" + fn()
-            for fn in self._get("action")
+        return "\n".join([
+            "\t" + _render_action(_compile_action(self, fn))
+            for fn in self._registry["action"].values()
         ])
-        return "\n".join([actions])
 
-    def _generate_objects(self):
+    def _generate_objects(self, relevant=None):
         objs = []
-        for attr in dir(self):
-            if (not attr.startswith("_") and
-                    not hasattr(getattr(self, attr), "section") and
-                    isinstance(getattr(self, attr), (list, PDDLDict))):
-
-                # Get object
-                attr = getattr(self, attr)
-
-                # Parse according to the type
-                if isinstance(attr, list):
-                    objs_ = " ".join([str(obj) for obj in attr])
-                    objs.append(
-                        f"\t\t{objs_} - {attr[0].__class__.__name__.lower()}")
-                elif isinstance(attr, PDDLDict):
-                    # Key is the alias, value is the object
-                    objs_ = " ".join([str(obj) for _, obj in attr.items()])
-                    objs.append(f"\t\t{objs_} - {attr.typ}")
-                else:
-                    raise TypeError
+        for attr in self.__dict__.get("_objects", {}).values():
+
+            # Parse according to the type
+            if isinstance(attr, list):
+                names = [str(obj) for obj in attr]
+                typ = _type_name(attr[0].__class__)
+            elif isinstance(attr, PDDLObjects):
+                names, typ = attr.names, attr.typ
+            elif isinstance(attr, PDDLDict):
+                # Key is the alias, value is the object
+                names = [str(obj) for _, obj in attr.items()]
+                typ = attr.typ
+            else:
+                raise TypeError
+
+            if relevant is not None:
+                # Relevant objects are named as in the atoms
+                names = [name for name in names
+                         if name.replace("_", "-") in relevant.objects]
+                if not names:
+                    continue
+            objs.append(f"\t\t{' '.join(names)} - {typ}")
 
         objs = "\n".join(objs)
         return "\n".join(["\t(:objects", objs, "\t)"])
 
     def _get(self, item):
-        user_defined = [attr for attr in dir(self)
-                        if hasattr(getattr(self, attr), "section")]
-        return [getattr(self, user_dfn) for user_dfn in user_defined
-                if getattr(self, user_dfn).section == item]
+        return [getattr(self, name) for name in self._registry[item]]
 
 
 def action(*Types):
 
     def decorator(func):
 
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-
-            # Subheader
-            action_name = f"(:action {func.__name__.replace('_', '-')}"
+        # We don't need the self for the rest of this code
+        _, *varnames = func.__code__.co_varnames
+        varnames = varnames[:func.__code__.co_argcount-1]
 
-            # We don't need the self for the rest of this code
-            _, *params = list(inspect.signature(func).parameters.items())
-            _, *varnames = func.__code__.co_varnames
-            varnames = varnames[:func.__code__.co_argcount-1]
-
-            # Call the function to get the return values to be used
-            # in the later part of this function
-            dummy_args = [Type(varname)
-                          for Type, varname in zip(Types, varnames)]
-            all_args = list(args) + dummy_args
-
-            precond, effect = func(*all_args)
-
-            # The first type is self; we'll ignore that
-            _, *args = args
-
-            # Check types
-            # Ignore if it's NoneType (to define the domain)
-            for Class, arg in zip(Types, args):
-                if not isinstance(arg, (Class, type(None))):
-                    raise TypeError(f"Expected {Class.__name__} for action '{action_name}' "
-                                    f"but got {type(arg).__name__}")
-
-            # Parameters
-            repre = [f"?{a} - {b.__name__.lower()}"
-                     for a, b in zip(varnames, Types)]
-            repre = " ".join(repre)
-            repre = f"\t\t:parameters ({repre})"
-
-            # Precond
-            if not isinstance(precond, list):
-                precond = [precond]
-            precond = [str(p.split(" | ")[1]) for p in precond]
-            precond = "\t\t:precondition " + join(precond, " ")
-
-            # Effect
-            if not isinstance(effect, list):
-                effect = [effect]
-            effect = [str(e.split(" | ")[1]) for e in effect]
-            effect = "\t\t:effect " + join(effect, " ")
-
-            # Final
-            actn = [action_name, repre, precond, effect, "\t)"]
-            actn = join(actn, "\n", False)
-            actn = actn.replace('_', '-')
-
-            return actn
+        @wraps(func)
+        def wrapper(self):
+            return _render_action(_compile_action(self, wrapper))
 
         setattr(wrapper, "section", "action")
+        setattr(wrapper, "name", func.__name__.replace('_', '-'))
+        setattr(wrapper, "params", tuple(varnames))
+        setattr(wrapper, "types", Types)
         return wrapper
 
     return decorator
 
 
-def predicate(*Types) -> str:
+def predicate(*Types) -> Atom:
 
     def decorator(func):
 
-        @wraps(func)
-        def wrapper(*args, **kwargs):
+        # Everything that depends only on the signature is computed once
+        # here; a call then only has to check types and build a tuple
+        func_name = _pddl_name(func)
 
-            # Invoke function to invoke Python's argument checking
-            # We don't actually need it
-            # func(*args, **kwargs)
+        # The first parameter is self; we'll ignore that
+        _, *params = list(inspect.signature(func).parameters)
 
-            func_name = func.__name__.replace("_", "-")
-            if func_name.endswith("-"):
-                func_name = func_name[:-1]
+        # Representation in :predicates
+        repre = [f"?{_param_name(param)} - {_type_name(Class)}"
+                 for param, Class in zip(params, Types)]
+        declaration = "(" + " ".join([func_name, *repre]) + ")"
 
-            # The first type is self; we'll ignore that
-            _, *params = list(inspect.signature(func).parameters.items())
-            _, *args = args
+        # Argument classes that have already passed the type check for
+        # each position, so that most calls only do a set lookup
+        checked = tuple(set() for _ in Types)
+
+        @wraps(func)
+        def wrapper(self, *args):
 
             # Check types
             # Ignore if it's NoneType (to define the domain)
-            for Class, arg in zip(Types, args):
-                if not isinstance(arg, (Class, type(None))):
+            for Class, seen, arg in zip(Types, checked, args):
+                if arg.__class__ in seen:
+                    continue
+                if arg is not None and not self._types.is_subtype(
+                        arg.__class__, Class):
                     raise TypeError(f"Expected type {Class.__name__} for predicate '{func_name}' "
                                     f"but found {type(arg).__name__}")
-
-            # Representation 1 (in :predicates)
-            _, *params = list(inspect.signature(func).parameters.items())
-            repr1 = []
-            for param, Class in zip(params, Types):
-                param_name, _ = param
-                repr1.append(f"?{param_name} - {Class.__name__.lower()}")
-            repr1 = " ".join(repr1)
-            repr1 = f"({func_name} {repr1})"
-
-            # Representation 2 (in :action :precondition/:effect)
-            repr2 = [f"?{str(arg).replace('_', '-')}" for arg in args]
-            repr2 = " ".join(repr2)
-            repr2 = f"({func_name} {repr2})"
-
-            # Representation 3 (in :init and :goal)
-            args = [str(arg).replace('_', '-') for arg in args]
-            params3 = "(" + " ".join([func_name, *args]) + ")"
-
-            return PDDLString(repr1) + " | " + PDDLString(repr2) + " | " + PDDLString(params3)
-
+                seen.add(arg.__class__)
+
+            return Atom(func_name, args)
+
+        def many(*columns) -> AtomBatch:
+            """Atoms for parallel columns of arguments. Each column is an
+            `ObjectColumn` from `PDDLObjects.take`, a whole `PDDLObjects`
+            collection, a sequence or iterable of objects, or a single
+            object that is repeated for every atom.
+            """
+            if len(columns) != len(Types):
+                raise TypeError(f"Predicate '{func_name}' takes {len(Types)} "
+                                f"columns but {len(columns)} were given")
+
+            # Type check each column as a whole and turn it into names
+            names, single = [], {}
+            for i, (Class, column) in enumerate(zip(Types, columns)):
+                if isinstance(column, PDDLObjects):
+                    column = column.take(range(len(column)))
+                if isinstance(column, ObjectColumn):
+                    classes = {column.objects.Type}
+                    column = column.names()
+                elif isinstance(column, UserString):
+                    classes = {column.__class__}
+                    single[i] = column.data
+                    column = None
+                else:
+                    # Iterators can only be read once
+                    column = list(column)
+                    classes = {arg.__class__ for arg in column}
+                    column = [str(arg) for arg in column]
+                for Found in classes:
+                    if not wrapper.type_index.is_subtype(Found, Class):
+                        raise TypeError(f"Expected type {Class.__name__} for predicate '{func_name}' "
+                                        f"but found {Found.__name__}")
+                names.append(column)
+
+            # Repeat single objects to the length of the other columns
+            lengths = {len(column) for column in names if column is not None}
+            if len(lengths) > 1:
+                raise ValueError(f"Columns for predicate '{func_name}' "
+                                 "have different lengths")
+            length = lengths.pop() if lengths else 1
+            names = [[single[i]] * length if column is None else column
+                     for i, column in enumerate(names)]
+
+            return AtomBatch(func_name, tuple(names))
+
+        setattr(wrapper, "many", many)
         setattr(wrapper, "section", "predicate")
+        setattr(wrapper, "name", func_name)
+        setattr(wrapper, "params", tuple(params))
+        setattr(wrapper, "types", Types)
+        setattr(wrapper, "declaration", declaration)
+        setattr(wrapper, "type_index", TypeIndex({}))
         return wrapper
 
     return decorator
@@ -309,12 +924,12 @@ def goal(func) -> str:
     @wraps(func)
     def wrapper(*args, **kwargs):
         goals = func(*args, **kwargs)
+        if isinstance(goals, Iterator):
+            goals = list(goals)
         if not isinstance(goals, list):
-            raise TypeError("Return type of `goal` method must be a list")
-
-        goals = [str(g.split(" | ")[2]) for g in goals]
-        goals = f"(:goal {join(goals)})"
-        return PDDLString(goals)
+            raise TypeError("Return type of `goal` method must be a list "
+                            "or a generator")
+        return _render_goal(goals)
     setattr(wrapper, "section", "goal")
     return wrapper
 
@@ -323,16 +938,234 @@ def init(func) -> str:
     @wraps(func)
     def wrapper(*args, **kwargs):
         inits = func(*args, **kwargs)
+        if isinstance(inits, Iterator):
+            inits = list(inits)
         if not isinstance(inits, list):
-            raise TypeError("Return type of `init` method must be a list")
-
-        inits = [str(g.split(" | ")[2]) for g in inits]
-        inits = f"(:init {join(inits, and_marker=False)})"
-        return PDDLString(inits)
+            raise TypeError("Return type of `init` method must be a list "
+                            "or a generator")
+        return _render_init(inits)
     setattr(wrapper, "section", "init")
     return wrapper
 
 
+def _render_init(inits: list) -> PDDLString:
+    inits = [g.render() for g in inits]
+    inits = [g for g in inits if g]
+    return PDDLString(f"(:init {join(inits, and_marker=False)})")
+
+
+def _render_goal(goals: list) -> PDDLString:
+    # Expand batches so that (and ...) depends on the number of atoms
+    goals = [g.render() for g in _flatten(goals)]
+    return PDDLString(f"(:goal {join(goals)})")
+
+
+def _atom_list(atoms) -> list:
+    return list(atoms) if isinstance(atoms, Iterator) else atoms
+
+
+def _count(atoms) -> int:
+    """Number of atoms, counting each atom of a batch"""
+    return sum(len(atom) if isinstance(atom, AtomBatch) else 1
+               for atom in atoms)
+
+
+def _atoms(method, kwargs: dict):
+    """Atoms returned or yielded by an `@init` or `@goal` method,
+    without rendering them"""
+    atoms = method.__wrapped__(method.__self__, **kwargs)
+    if not isinstance(atoms, (list, Iterator)):
+        raise TypeError(f"Return type of `{method.__name__}` method must be a list "
+                        "or a generator")
+    return atoms
+
+
+def _write_atoms(f, atoms, and_marker: bool = True) -> int:
+    """Render `atoms` to the file object `f` in chunks of `CHUNK_SIZE`,
+    producing the same text as `join`, and return the number of atoms"""
+    atoms = _flatten(atoms) if and_marker else iter(atoms)
+
+    # `join` only leaves out the (and ...) for exactly one atom
+    head = list(islice(atoms, 2))
+    and_marker = and_marker and len(head) != 1
+
+    if and_marker:
+        f.write("(and ")
+    sep = ""
+    count = 0
+    chunk = head
+    while chunk:
+        count += _count(chunk)
+        text = " ".join(filter(None, [atom.render() for atom in chunk]))
+        if text:
+            f.write(sep + text)
+            sep = " "
+        chunk = list(islice(atoms, CHUNK_SIZE))
+    if and_marker:
+        f.write(")")
+    return count
+
+
+def _flatten(atoms):
+    """Iterate over `atoms` with each `AtomBatch` expanded into its atoms"""
+    for atom in atoms:
+        if isinstance(atom, AtomBatch):
+            yield from atom
+        else:
+            yield atom
+
+
+def open_pddl(filename: str, mode: str = "r", compression: str = None):
+    """Open a PDDL file as UTF-8 text, compressed with gzip or xz
+    according to `compression` or else to the extension of `filename`.
+    Reads and writes are buffered in chunks of `BUFFER_SIZE` bytes.
+
+    Args:
+        filename (str): Name of the file.
+        mode (str, optional): "r", "w" or "a". Defaults to "r".
+        compression (str, optional): "gzip", "xz" or None.
+            Defaults to the one of the extension, e.g. "gzip" for ".gz".
+    """
+    if compression is None:
+        compression = COMPRESSION.get(Path(filename).suffix)
+    if compression is None:
+        return open(filename, mode, encoding="utf-8", buffering=BUFFER_SIZE)
+
+    if compression == "gzip":
+        # A fixed mtime makes the output depend only on the text
+        f = gzip.GzipFile(filename, mode + "b", compresslevel=6, mtime=0)
+    elif compression == "xz":
+        f = lzma.LZMAFile(filename, mode + "b")
+    else:
+        raise ValueError(f"Unknown compression '{compression}'. "
+                         f"Expected one of {', '.join(COMPRESSION.values())}.")
+    if mode == "r":
+        f = io.BufferedReader(f, BUFFER_SIZE)
+    else:
+        f = io.BufferedWriter(f, BUFFER_SIZE)
+    return io.TextIOWrapper(f, encoding="utf-8")
+
+
+def _pddl_filename(filename: str, compression: str = None) -> str:
+    """Name of the file for the base name `filename`, with the extension
+    of `compression` unless it already has a compression extension"""
+    if Path(filename).suffix in COMPRESSION:
+        return filename
+    filename = filename + ".pddl"
+    if compression is not None:
+        extensions = {name: ext for ext, name in COMPRESSION.items()}
+        if compression not in extensions:
+            raise ValueError(f"Unknown compression '{compression}'. "
+                             f"Expected one of {', '.join(extensions)}.")
+        filename += extensions[compression]
+    return filename
+
+
+def _source_hash(cls) -> str:
+    """Hash of the source files of `cls`, its Domain base classes and this
+    module, or None if any of them cannot be found"""
+    filenames = _source_files(cls)
+    if filenames is None:
+        return None
+    digest = hashlib.sha256()
+    for filename in filenames:
+        digest.update(Path(filename).read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def _source_files(cls) -> list:
+    """Source files of the modules of `cls`, its Domain base classes and
+    this module, sorted by module name, or None if any of them cannot be
+    found"""
+    modules = {klass.__module__ for klass in cls.__mro__
+               if issubclass(klass, Domain)}
+    filenames = []
+    for name in sorted(modules):
+        filename = getattr(sys.modules.get(name), "__file__", None)
+        if filename is None:
+            return None
+        filenames.append(filename)
+    return filenames
+
+
+def _pddl_name(func) -> str:
+    """Name of a predicate or action as it appears in PDDL"""
+    name = func.__name__.replace("_", "-")
+    if name.endswith("-"):
+        name = name[:-1]
+    return name
+
+
+def action_schema(domain, name: str) -> ActionSchema:
+    """Compiled schema of the `@action` with the attribute name `name`
+
+    Args:
+        domain (Domain): Subclassed Domain, or an instance of it.
+        name (str): Attribute name of the action, e.g. "load_truck".
+    """
+    if isinstance(domain, type):
+        domain = domain.__new__(domain)
+    return _compile_action(domain, domain._registry["action"][name])
+
+
+def _compile_action(domain, fn) -> ActionSchema:
+    """Evaluate an `@action` with one placeholder object per parameter and
+    record which parameters each atom takes. This is done once per class."""
+    schemas = _schema_cache.setdefault(domain.__class__, {})
+    if fn in schemas:
+        return schemas[fn]
+
+    params = [Type(param) for Type, param in zip(fn.types, fn.params)]
+    precond, effect = fn.__wrapped__(domain, *params)
+    if not isinstance(precond, list):
+        precond = [precond]
+    if not isinstance(effect, list):
+        effect = [effect]
+
+    index = {id(param): i for i, param in enumerate(params)}
+
+    def literal(atom: Atom) -> tuple:
+        try:
+            args = tuple(index[id(arg)] for arg in atom.args)
+        except KeyError:
+            raise ValueError(f"Action '{fn.name}' takes an argument in "
+                             f"{atom.render()} that is not one of its "
+                             "parameters") from None
+        return atom.name, args, atom.negated
+
+    preconditions = [literal(atom) for atom in precond]
+    effects = [literal(atom) for atom in effect]
+    schemas[fn] = ActionSchema(
+        fn.name, fn.params, fn.types,
+        [(pred, args) for pred, args, negated in preconditions if not negated],
+        [(pred, args) for pred, args, negated in preconditions if negated],
+        [(pred, args) for pred, args, negated in effects if not negated],
+        [(pred, args) for pred, args, negated in effects if negated],
+        preconditions, effects)
+    return schemas[fn]
+
+
+def _render_action(schema: ActionSchema) -> str:
+    """The (:action ...) block of a compiled action schema"""
+    params = [_param_name(param).replace('_', '-')
+              for param in schema.params]
+
+    def render(pred, args, negated):
+        atom = "(" + " ".join([pred, *[f"?{params[i]}" for i in args]]) + ")"
+        return f"(not {atom})" if negated else atom
+
+    repre = " ".join(f"?{param} - {_type_name(Type).replace('_', '-')}"
+                     for param, Type in zip(params, schema.types))
+    return join([
+        f"(:action {schema.name}",
+        f"\t\t:parameters ({repre})",
+        "\t\t:precondition " + join([render(*literal)
+                                     for literal in schema.preconditions]),
+        "\t\t:effect " + join([render(*literal)
+                               for literal in schema.effects]),
+        "\t)"], "\n", False)
+
+
 def join(li: list, sep: str = " ", and_marker: bool = True) -> str:
     li = [str(l) for l in li]
 
@@ -345,16 +1178,40 @@ def join(li: list, sep: str = " ", and_marker: bool = True) -> str:
             return sep.join(li)
 
 
+def _type_name(Type) -> str:
+    """PDDL name of a type: the name it was read with by `py2pddl.reader`,
+    if any, else the class name in lower case"""
+    return vars(Type).get("_pddl_name") or Type.__name__.lower()
+
+
+def _param_name(param: str) -> str:
+    """PDDL name of a parameter, without the "_" that is appended to
+    keywords, e.g. `from_`, like the names of predicates"""
+    return param[:-1] if param.endswith("_") else param
+
+
+def _header_name(cls, kind: str) -> str:
+    """PDDL name of a domain or problem class: the name it was read with
+    by `py2pddl.reader`, if any, else the class name without `kind`"""
+    if "_pddl_name" in vars(cls):
+        return cls._pddl_name
+    return cls.__name__.lower().replace(kind, "")
+
+
 def _create_objs(cls,
                  objs: list,
-                 prefix: str = "") -> dict:
+                 prefix: str = "") -> PDDLObjects:
+    """Create the objects of this type, one per element of `objs`, which
+    is also the alias for looking up the object. A `range` is stored
+    without a lookup table, e.g. `create_objs(range(100000), prefix="p")`.
+    """
     class_name = cls.__name__.lower()
 
     if prefix is None:
         prefix = class_name
 
-    obj_dict = PDDLDict(
-        class_name,
-        {obj: cls(f"{prefix}{str(obj)}") for obj in objs})
+    if not isinstance(objs, range):
+        objs = list(objs)
+    names = [sys.intern(f"{prefix}{str(obj)}") for obj in objs]
 
-    return obj_dict
+    return PDDLObjects(cls, objs, names)
@@ -0,0 +1,369 @@
+import re
+import sys
+import keyword
+from types import FunctionType
+from itertools import groupby
+
+from .py2pddl import Domain, Atom, AtomBatch, open_pddl
+from .py2pddl import create_type, predicate, action, init, goal
+
+# Number of characters read from a PDDL file at a time
+READ_SIZE = 1 << 20
+
+# Code of the functions made by `_make_function`, by number of parameters
+_templates = {}
+
+_TOKEN = re.compile(r";[^\n]*|[()]|[^\s();]+")
+
+
+def tokenize(f):
+    """Iterate over the tokens of a PDDL file object, i.e. parentheses and
+    symbols, reading `READ_SIZE` characters at a time. Comments are
+    skipped and symbols are lowercased."""
+    rest = ""
+    while True:
+        chunk = f.read(READ_SIZE)
+        text = rest + chunk
+        if chunk:
+            # Hold back what could continue in the next chunk: an
+            # unterminated comment or a symbol at the very end
+            newline = text.rfind("\n")
+            if text.find(";", newline + 1) >= 0:
+                end = newline + 1
+            else:
+                end = max(text.rfind(c) for c in " \t\r\n()") + 1
+            text, rest = text[:end], text[end:]
+        for token in _TOKEN.findall(text):
+            if token[0] != ";":
+                yield sys.intern(token.lower())
+        if not chunk:
+            return
+
+
+def read_expression(tokens, first: str = None):
+    """Read one symbol or parenthesised expression, as nested lists"""
+    token = first if first is not None else next(tokens)
+    if token != "(":
+        if token == ")":
+            raise ValueError("Unexpected ')'")
+        return token
+    return _read_list(tokens, [])
+
+
+def _read_list(tokens, expression: list) -> list:
+    """Read the rest of an expression whose opening parenthesis and
+    first items are already in `expression`"""
+    stack = [expression]
+    for token in tokens:
+        if token == "(":
+            stack.append([])
+        elif token == ")":
+            expression = stack.pop()
+            if not stack:
+                return expression
+            stack[-1].append(expression)
+        else:
+            stack[-1].append(token)
+    raise ValueError("Unexpected end of file")
+
+
+def read_domain(filename: str) -> type:
+    """Create a Domain subclass from a PDDL domain file with its types,
+    predicates and actions. Only the `:strips` and `:typing` requirements
+    are supported, like in the rest of py2pddl. Files ending with ".gz"
+    or ".xz" are decompressed.
+
+    Args:
+        filename (str): Name of PDDL domain file.
+    """
+    with open_pddl(filename) as f:
+        sections = _read_define(tokenize(f), "domain")
+    name = sections.pop("domain")
+    namespace = {}
+
+    # Types, with each parent created before its children
+    parents = {}
+    for typ, parent in _typed_list(sections.get(":types", [])):
+        parents[typ] = parent
+        if parent is not None:
+            parents.setdefault(parent, None)
+    types = {}
+
+    def make_type(typ):
+        if typ not in types:
+            parent = parents.get(typ)
+            Base = make_type(parent) if parent is not None else None
+            attr = _identifier(typ).capitalize()
+            types[typ] = namespace[attr] = create_type(attr, Base)
+            # Kept as written, e.g. "heavy-truck", for the PDDL
+            types[typ]._pddl_name = typ
+        return types[typ]
+
+    for typ in parents:
+        make_type(typ)
+
+    def param_types(params):
+        # Untyped parameters are of the type "object"
+        if any(typ is None for _, typ in params):
+            parents.setdefault("object", None)
+            make_type("object")
+        return [_type(types, typ) for _, typ in params]
+
+    # Predicates
+    predicates = {}
+    for declaration in sections.get(":predicates", []):
+        pred, *params = declaration
+        params = _typed_list(params)
+        func = _make_function(pred, [_identifier(p[1:]) for p, _ in params],
+                              None)
+        wrapper = predicate(*param_types(params))(func)
+        predicates[pred] = _identifier(pred)
+        namespace[_identifier(pred)] = wrapper
+
+    # Actions
+    for act in sections.get(":action", []):
+        act_name, *body = act
+        body = dict(zip(body[::2], body[1::2]))
+        params = _typed_list(body.get(":parameters", []))
+        variables = [p for p, _ in params]
+        precond = _conjunction(body.get(":precondition", ["and"]))
+        effect = _conjunction(body.get(":effect", ["and"]))
+        func = _make_function(
+            act_name, [_identifier(v[1:]) for v in variables],
+            _action_body(predicates, variables, precond, effect))
+        namespace[_identifier(act_name)] = action(
+            *param_types(params))(func)
+
+    # The PDDL name is kept as is, as the class name may not give it back
+    namespace["_pddl_name"] = name
+    return type(f"{name}Domain", (Domain,), namespace)
+
+
+def read_problem(filename: str, domain) -> type:
+    """Create a Problem class from a PDDL problem file, as a subclass of
+    a Domain class, with its objects, :init and :goal
+
+    Args:
+        filename (str): Name of PDDL problem file.
+        domain (type or str): Domain subclass, or the name of a PDDL
+            domain file to read with `read_domain`.
+    """
+    if isinstance(domain, str):
+        domain = read_domain(domain)
+    types = domain._types.by_name
+    predicates = {fn.name: attr
+                  for attr, fn in domain._registry["predicate"].items()}
+
+    with open_pddl(filename) as f:
+        sections = _read_define(tokenize(f), "problem")
+    name = sections.pop("problem")
+
+    # One collection per group of objects of the same type
+    groups = []
+    for obj, typ in _typed_list(sections.get(":objects", [])):
+        if not groups or groups[-1][1] != typ:
+            groups.append(([], typ))
+        groups[-1][0].append(obj)
+    init_facts = [_literal(fact) for fact in sections.get(":init", [])]
+    goal_facts = _conjunction(sections.get(":goal", ["and"]))
+
+    def __init__(self):
+        names = {}
+        for objs, typ in groups:
+            attr = "objects_" + _identifier(typ or "object")
+            while attr in names:
+                attr += "_"
+            names[attr] = None
+            setattr(self, attr, _type(types, typ).create_objs(objs))
+        self._facts = (init_facts, goal_facts)
+
+    @init
+    def init_(self):
+        return _batches(self, predicates, self._facts[0])
+
+    @goal
+    def goal_(self):
+        return _batches(self, predicates, self._facts[1])
+
+    namespace = {"__init__": __init__, "init": init_, "goal": goal_,
+                 "_pddl_name": name}
+    return type(f"{name}Problem", (domain,), namespace)
+
+
+def _read_define(tokens, kind: str) -> dict:
+    """Sections of a `(define ...)` expression. Actions are collected in a
+    list under ":action"."""
+    if next(tokens) != "(" or next(tokens) != "define":
+        raise ValueError("Expected '(define'")
+    sections = {":action": []}
+    for token in tokens:
+        if token == ")":
+            return sections
+        if token != "(":
+            raise ValueError(f"Unexpected '{token}'")
+        head = next(tokens)
+        if head == ":init":
+            # Read the facts one at a time rather than as one nested list
+            facts = []
+            for token in tokens:
+                if token == ")":
+                    break
+                facts.append(tuple(read_expression(tokens, token)))
+            sections[head] = facts
+            continue
+
+        _, *body = _read_list(tokens, [head])
+        if head == kind:
+            sections[kind] = body[0]
+        elif head == ":action":
+            sections[":action"].append(body)
+        elif head == ":goal":
+            sections[head] = body[0] if body else ["and"]
+        else:
+            sections[head] = body
+    raise ValueError("Unexpected end of file")
+
+
+def _typed_list(items: list) -> list:
+    """Pairs of names and types of a list like `a b - t c`; names
+    without a type get None"""
+    pairs, names = [], []
+    items = iter(items)
+    for item in items:
+        if item == "-":
+            typ = next(items)
+            pairs.extend((name, typ) for name in names)
+            names = []
+        else:
+            names.append(item)
+    pairs.extend((name, None) for name in names)
+    return pairs
+
+
+def _conjunction(expression) -> list:
+    """Atoms of `(and ...)` or of a single atom, as pairs of the atom and
+    whether it is negated"""
+    atoms = expression[1:] if expression[:1] == ["and"] else [expression]
+    return [_literal(atom) for atom in atoms]
+
+
+def _literal(atom) -> tuple:
+    """Pair of an atom, or of the atom in `(not ...)`, and whether it is
+    negated"""
+    if atom[0] == "not":
+        return tuple(atom[1]), True
+    if not isinstance(atom[0], str) or atom[0] in (
+            "and", "or", "forall", "exists", "when", "imply"):
+        raise ValueError(f"Unsupported expression '{atom[0]}'. "
+                         "Only conjunctions of atoms are supported.")
+    if any(not isinstance(arg, str) for arg in atom):
+        raise ValueError(f"Unsupported expression '{atom[0]}'. "
+                         "Only atoms with objects are supported.")
+    return tuple(atom), False
+
+
+def _batches(problem, predicates: dict, facts: list) -> list:
+    """Atoms for the facts, as one `AtomBatch` per run of facts of the
+    same predicate so that the order is preserved. The columns are type
+    checked by the names of the objects, without creating them."""
+    # Atoms are written with "_" replaced by "-" but :objects is not
+    types = {}
+    for objs in problem.__dict__.get("_objects", {}).values():
+        types.update(dict.fromkeys(objs.names, objs.Type))
+        types.update(dict.fromkeys([name.replace("_", "-")
+                                    for name in objs.names if "_" in name],
+                                   objs.Type))
+
+    batches = []
+    for (pred, negated), run in groupby(facts, key=lambda f: (f[0][0], f[1])):
+        if pred not in predicates:
+            raise ValueError(f"Unknown predicate '{pred}'")
+        fn = problem._registry["predicate"][predicates[pred]]
+        run = [atom[1:] for atom, _ in run]
+        if any(len(args) != len(fn.types) for args in run):
+            raise ValueError(f"Predicate '{pred}' takes {len(fn.types)} "
+                             "arguments")
+        if not fn.types:
+            batches.extend(Atom(fn.name, (), negated) for _ in run)
+            continue
+
+        columns = [list(column) for column in zip(*run)]
+        for Class, column in zip(fn.types, columns):
+            unknown = set(column).difference(types)
+            if unknown:
+                raise ValueError(f"Unknown object '{unknown.pop()}'")
+            for Found in set(map(types.__getitem__, column)):
+                if not problem._types.is_subtype(Found, Class):
+                    raise TypeError(f"Expected type {Class.__name__} for predicate '{pred}' "
+                                    f"but found {Found.__name__}")
+        batches.append(AtomBatch(fn.name, tuple(columns), negated))
+    return batches
+
+
+def _action_body(predicates: dict, variables: list,
+                 precond: list, effect: list):
+    # Variables are matched up to "-" and "_", as py2pddl writes "_" in
+    # the parameters of an action but "-" in its atoms
+    index = {_variable(variable): i for i, variable in enumerate(variables)}
+
+    def literals(self, args, atoms):
+        result = []
+        for (pred, *params), negated in atoms:
+            atom = getattr(self, predicates[pred])(
+                *[args[index[_variable(param)]] for param in params])
+            result.append(~atom if negated else atom)
+        return result
+
+    def body(self, *args):
+        return literals(self, args, precond), literals(self, args, effect)
+
+    return body
+
+
+def _make_function(name: str, params: list, body):
+    """Function named `name` with the parameters `self, *params` that
+    calls `body`. The decorators read the parameter names from the code
+    object, so they have to be real parameters. The code is compiled once
+    per number of parameters and renamed, as compiling is slow, except on
+    Pythons without `CodeType.replace` (< 3.8)."""
+    n = len(params)
+    if n not in _templates:
+        args = ", ".join(["self", *[f"_{i}" for i in range(n)]])
+        namespace = {}
+        exec(f"def function({args}):\n"  # pylint:disable=exec-used
+             f"    return _body({args}) if _body else None\n", namespace)
+        _templates[n] = namespace["function"].__code__
+    code = _templates[n]
+
+    name = _identifier(name)
+    if hasattr(code, "replace"):
+        function = FunctionType(code.replace(
+            co_name=name, co_varnames=("self", *params)), {"_body": body})
+    else:
+        args = ", ".join(["self", *params])
+        namespace = {"_body": body}
+        exec(f"def function({args}):\n"  # pylint:disable=exec-used
+             f"    return _body({args}) if _body else None\n", namespace)
+        function = namespace["function"]
+    function.__name__ = function.__qualname__ = name
+    return function
+
+
+def _identifier(name: str) -> str:
+    name = name.replace("-", "_")
+    if keyword.iskeyword(name) or not name.isidentifier():
+        name += "_"
+    return name
+
+
+def _variable(name):
+    return name.replace("-", "_") if isinstance(name, str) else name
+
+
+def _type(types: dict, typ: str) -> type:
+    if typ is None:
+        typ = "object"
+    if typ not in types:
+        raise ValueError(f"Unknown type '{typ}'")
+    return types[typ]
+
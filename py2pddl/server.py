@@ -0,0 +1,159 @@
+import sys
+import json
+import socket as sockets
+import asyncio
+from pathlib import Path
+import fire
+
+from .parse import load_problem
+
+# Longest request line accepted
+LIMIT = 1 << 24
+
+
+class Server:
+    """Renders PDDL for requests while keeping the Problem modules
+    imported, so that a request only pays for rendering
+
+    Requests and responses are JSON objects, one per line. A request has
+    the keys
+
+        "module": Python file with the Domain and Problem classes
+        "render": "problem" (default), "domain" or "both"
+        "init", "goal": keyword arguments of the `@init` and `@goal` methods
+        "id": anything, echoed in the response
+
+    and the response has "id" and the rendered "problem" and/or "domain",
+    or "error". A module is imported again when its file changes.
+
+    Requests are handled one at a time in the event loop, as rendering
+    holds the GIL anyway.
+
+    Args:
+        modules (list, optional): Python files to import up front.
+    """
+
+    def __init__(self, modules: list = ()):
+        self._problems = {}
+        for module in modules:
+            self.problem(module)
+
+    def problem(self, module: str):
+        """Problem instance of a module, imported on first use"""
+        path = Path(module).resolve()
+        mtime = path.stat().st_mtime_ns
+        cached = self._problems.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = self._problems[path] = (mtime,
+                                             load_problem(str(path))())
+        return cached[1]
+
+    def handle(self, request: dict) -> dict:
+        """Response to one request"""
+        response = {"id": request.get("id")}
+        try:
+            render = request.get("render", "problem")
+            if render not in ("problem", "domain", "both"):
+                raise ValueError(f"Unknown render '{render}'. Expected "
+                                 "'problem', 'domain' or 'both'.")
+            p = self.problem(request["module"])
+            if render != "problem":
+                response["domain"] = p.render_domain()
+            if render != "domain":
+                response["problem"] = p.render_problem(
+                    init=request.get("init"), goal=request.get("goal"))
+        except Exception as e:  # pylint:disable=broad-except
+            response["error"] = f"{type(e).__name__}: {e}"
+        return response
+
+    async def serve(self, reader: asyncio.StreamReader, write):
+        """Answer the requests read from `reader` until it is closed,
+        passing each response line to the coroutine function `write`"""
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("Expected a JSON object")
+            except ValueError as e:
+                response = {"id": None, "error": f"Invalid request: {e}"}
+            else:
+                response = self.handle(request)
+            await write((json.dumps(response) + "\n").encode("utf-8"))
+
+    async def serve_stdio(self):
+        """Read requests from stdin and write responses to stdout"""
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=LIMIT)
+        await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+        async def write(data: bytes):
+            sys.stdout.buffer.write(data)
+            sys.stdout.buffer.flush()
+
+        await self.serve(reader, write)
+
+    async def serve_unix(self, path: str):
+        """Accept connections on a Unix socket, each one sending any
+        number of requests"""
+        async def connection(reader, writer):
+            async def write(data: bytes):
+                writer.write(data)
+                await writer.drain()
+            try:
+                await self.serve(reader, write)
+            finally:
+                writer.close()
+
+        server = await asyncio.start_unix_server(connection, path=path,
+                                                 limit=LIMIT)
+        print(f"Serving on {path}.", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+
+def request(socket: str, **kwargs) -> dict:
+    """Send one request to a server listening on a Unix socket and
+    return the response, e.g.
+
+        request("/tmp/py2pddl.sock", module="aircargo.py", goal={"cargo": 2})
+
+    Args:
+        socket (str): Path of the Unix socket.
+        kwargs: Keys of the request. See `Server`.
+    """
+    with sockets.socket(sockets.AF_UNIX, sockets.SOCK_STREAM) as s:
+        s.connect(socket)
+        s.sendall((json.dumps(kwargs) + "\n").encode("utf-8"))
+        with s.makefile("rb") as f:
+            return json.loads(f.readline())
+
+
+def serve(*modules, socket: str = None):
+    """Serve PDDL renders of Python modules over stdin/stdout or a Unix
+    socket. See `Server` for the format of the requests.
+
+    Args:
+        modules (str): Python files containing both the Domain and
+            Problem class definitions, imported up front. Other modules
+            are imported on their first request.
+        socket (str, optional): Path of a Unix socket to listen on.
+            Defaults to reading stdin and writing stdout.
+    """
+    server = Server(modules)
+    try:
+        if socket is None:
+            asyncio.run(server.serve_stdio())
+        else:
+            asyncio.run(server.serve_unix(socket))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    fire.Fire(serve)
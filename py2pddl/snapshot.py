@@ -0,0 +1,171 @@
+import pickle
+from collections import UserString, namedtuple
+import fire
+
+from .py2pddl import (Domain, create_type, predicate, action,
+                      _compile_action, _domain_cache, _schema_cache)
+from .reader import _action_body, _make_function
+from .parse import load_problem
+
+# Protocol of the pickled snapshots, which holds for all supported Pythons
+PROTOCOL = 4
+
+# A Domain subclass compiled into plain data, so that it can be pickled
+# and turned back into a Domain subclass without running the module that
+# defines it.
+#   name        name of the class directly under Domain, for the header
+#   types       (attribute name or None, class name, index of the parent
+#               or None, PDDL name or None) of every type, parents first.
+#               Bases that are not types of the domain have no attribute
+#               name, and the PDDL name is only kept for the types of
+#               `py2pddl.reader`.
+#   predicates  (attribute name, function name, parameters, type indices)
+#   actions     (attribute name, function name, ActionSchema), where the
+#               `types` of the schema are type indices
+#   pddl        the rendered domain PDDL
+#   pddl_name   name of the domain in PDDL, if it is not derived from the
+#               class name, as for the classes of `py2pddl.reader`
+DomainSnapshot = namedtuple(
+    "DomainSnapshot",
+    ["name", "types", "predicates", "actions", "pddl", "pddl_name"],
+    defaults=[None])
+
+
+def snapshot(domain) -> DomainSnapshot:
+    """Compile the types, predicate signatures and action schemas of a
+    Domain subclass into a picklable `DomainSnapshot`
+
+    Only types made with `create_type` are supported, as a type is rebuilt
+    from its name and parent alone.
+
+    Args:
+        domain (Domain): Subclassed Domain, or an instance of it.
+    """
+    if isinstance(domain, type):
+        domain = domain.__new__(domain)
+    cls = domain.__class__
+    root = cls
+    while root.__bases__[0] is not Domain:
+        root = root.__bases__[0]
+
+    # Number the types and their bases, parents first
+    attrs = {Type: attr for attr, Type in domain._registry["types"].items()}
+    ids, types = {}, []
+
+    def number(Type):
+        if Type not in ids:
+            Base = Type.__bases__[0]
+            parent = None if Base is UserString else number(Base)
+            ids[Type] = len(types)
+            types.append((attrs.get(Type), Type.__name__, parent,
+                          vars(Type).get("_pddl_name")))
+        return ids[Type]
+
+    for Type in attrs:
+        number(Type)
+
+    predicates = tuple(
+        (attr, fn.__name__, fn.params, tuple(map(number, fn.types)))
+        for attr, fn in domain._registry["predicate"].items())
+    actions = []
+    for attr, fn in domain._registry["action"].items():
+        schema = _compile_action(domain, fn)
+        actions.append((attr, fn.__name__, schema._replace(
+            types=tuple(map(number, schema.types)))))
+
+    return DomainSnapshot(root.__name__, tuple(types), predicates,
+                          tuple(actions), domain.render_domain(),
+                          vars(root).get("_pddl_name"))
+
+
+def domain_class(snap: DomainSnapshot) -> type:
+    """Domain subclass of a snapshot. Its domain PDDL and action schemas
+    are cached up front, so neither is computed again, and problems can
+    be read for it with `read_problem`, then grounded, validated and
+    planned as for the original class.
+
+    Args:
+        snap (DomainSnapshot): Snapshot from `snapshot` or `load`.
+    """
+    namespace = {}
+    types = []
+    for attr, name, parent, *pddl_name in snap.types:
+        types.append(create_type(name, None if parent is None
+                                 else types[parent]))
+        if pddl_name and pddl_name[0] is not None:
+            types[-1]._pddl_name = pddl_name[0]
+        if attr is not None:
+            namespace[attr] = types[-1]
+
+    names = {}
+    for attr, name, params, ids in snap.predicates:
+        fn = predicate(*map(types.__getitem__, ids))(
+            _make_function(name, list(params), None))
+        names[fn.name] = attr
+        namespace[attr] = fn
+
+    # The actions get bodies that build their atoms from the schemas, in
+    # case a subclass compiles them again
+    schemas = {}
+    for attr, name, schema in snap.actions:
+        schema = schema._replace(types=tuple(map(types.__getitem__,
+                                                 schema.types)))
+        n = len(schema.params)
+        fn = action(*schema.types)(_make_function(
+            name, list(schema.params), _action_body(
+                names, list(range(n)),
+                [((pred, *args), negated)
+                 for pred, args, negated in schema.preconditions],
+                [((pred, *args), negated)
+                 for pred, args, negated in schema.effects])))
+        schemas[fn] = schema
+        namespace[attr] = fn
+
+    if snap.pddl_name is not None:
+        namespace["_pddl_name"] = snap.pddl_name
+    cls = type(snap.name, (Domain,), namespace)
+    _schema_cache[cls] = schemas
+    _domain_cache[cls] = snap.pddl
+    return cls
+
+
+def dump(domain, filename: str):
+    """Pickle the snapshot of a Domain subclass to a file
+
+    Args:
+        domain (Domain or DomainSnapshot): Subclassed Domain, an instance
+            of it, or its snapshot.
+        filename (str): Name of the file.
+    """
+    if not isinstance(domain, DomainSnapshot):
+        domain = snapshot(domain)
+    with open(filename, "wb") as f:
+        pickle.dump(domain, f, protocol=PROTOCOL)
+
+
+def load(filename: str) -> type:
+    """Domain subclass of a pickled snapshot. See `domain_class`.
+
+    Args:
+        filename (str): Name of the file written by `dump`.
+    """
+    with open(filename, "rb") as f:
+        return domain_class(pickle.load(f))
+
+
+def save_snapshot(infile: str, outfile: str = "domain.snapshot"):
+    """Write the snapshot of the domain of a Python module, for workers
+    to load with `load` instead of importing the module
+
+    Args:
+        infile (str): Name of Python file containing both the Domain
+            and Problem class definitions.
+        outfile (str, optional): Name of the snapshot file.
+            Defaults to "domain.snapshot".
+    """
+    dump(load_problem(infile), outfile)
+    print(f"Domain snapshot written to {outfile}.")
+
+
+if __name__ == "__main__":
+    fire.Fire(save_snapshot)
@@ -0,0 +1,299 @@
+import json
+import shutil
+import tempfile
+from pathlib import Path
+from itertools import islice
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+from .py2pddl import (PDDLObjects, PDDLDict, AtomBatch, BUFFER_SIZE,
+                      CHUNK_SIZE, _atoms, _flatten, _type_name)
+
+# Files of a store, in its directory
+META = "store.json"
+NAMES = "names.npy"
+OFFSETS = "offsets.npy"
+FACTS = "facts.npy"
+
+
+class FactStore:
+    """Objects and :init atoms of a problem instance kept on disk as
+    columns of NumPy arrays, which are memory-mapped when loaded
+
+    A store is a directory with
+
+        store.json   the object tables (attribute, type, aliases and
+                     range of ids) and the predicates
+        names.npy    the UTF-8 names of all objects, each followed by a
+                     space, as bytes
+        offsets.npy  where the name of each object starts in names.npy
+        facts.npy    one row per :init atom: the predicate id, then the
+                     ids of its arguments, padded with -1
+
+    Objects are numbered across all tables in the order they were
+    created. As the names of one table are contiguous, the text of a
+    table in :objects is a single slice of names.npy, and atoms are
+    rendered a chunk of rows at a time, only looking up the names of the
+    objects that the chunk uses. Nothing is read into memory until it
+    is written, so a store larger than the memory can be written out
+    again, or a part of it with `select`.
+
+    Needs NumPy.
+
+    Args:
+        path (str): Directory of the store, written by `FactStore.save`.
+        mmap_mode (str, optional): Passed to `numpy.load`. Defaults to
+            "r", i.e. read-only memory maps.
+    """
+
+    def __init__(self, path: str, mmap_mode: str = "r"):
+        _require_numpy()
+        self.path = Path(path)
+        meta = json.loads((self.path / META).read_text(encoding="utf-8"))
+        self.tables = meta["objects"]
+        self.predicates = [tuple(predicate)
+                           for predicate in meta["predicates"]]
+        self.names = np.load(self.path / NAMES, mmap_mode=mmap_mode)
+        self.offsets = np.load(self.path / OFFSETS, mmap_mode=mmap_mode)
+        self.facts = np.load(self.path / FACTS, mmap_mode=mmap_mode)
+        self._rows = range(len(self.facts))
+        self._predicate_ids = None
+
+    @classmethod
+    def save(cls, path: str, problem, init: dict = None) -> "FactStore":
+        """Write the objects and :init atoms of a problem instance to a
+        store, and load it
+
+        Args:
+            path (str): Directory of the store. It is created if needed.
+            problem (Domain): Instance of a subclassed Domain with its
+                objects created.
+            init (dict, optional): Keyword arguments for the `@init`
+                method.
+        """
+        _require_numpy()
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        tables, ids, names = [], {}, []
+        for attr, objects in problem.__dict__.get("_objects", {}).items():
+            if isinstance(objects, PDDLObjects):
+                typ, table = objects.typ, objects.names
+                keys = objects._keys
+            elif isinstance(objects, PDDLDict):
+                typ, table = objects.typ, [str(obj)
+                                           for obj in objects.values()]
+                keys = list(objects.keys())
+            else:
+                typ = _type_name(objects[0].__class__)
+                table, keys = [str(obj) for obj in objects], range(len(objects))
+            if isinstance(keys, range):
+                keys = {"range": [keys.start, keys.stop, keys.step]}
+            else:
+                keys = list(keys)
+            tables.append({"attr": attr, "type": typ, "start": len(names),
+                           "stop": len(names) + len(table), "keys": keys})
+            for name in table:
+                ids.setdefault(name, len(names))
+                names.append(name)
+
+        encoded = [(name + " ").encode("utf-8") for name in names]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(name) for name in encoded], out=offsets[1:])
+        np.save(path / NAMES, np.frombuffer(b"".join(encoded), dtype=np.uint8))
+        np.save(path / OFFSETS, offsets)
+        del encoded
+
+        # Rows are written as the atoms are produced, padded to the
+        # largest arity of the domain
+        predicates = {}
+        dtype = np.int32 if len(names) < 2**31 else np.int64
+        width = 1 + max((len(fn.types) for fn in
+                         problem._registry["predicate"].values()), default=0)
+        padding = [-1] * width
+
+        def blocks():
+            atoms = _flatten(_atoms(problem.init, init or {}))
+            chunk = list(islice(atoms, CHUNK_SIZE))
+            while chunk:
+                block = []
+                for atom in chunk:
+                    key = (atom.name, atom.negated, len(atom.args))
+                    row = [predicates.setdefault(key, len(predicates))]
+                    for arg in atom.args:
+                        if str(arg) not in ids:
+                            raise ValueError(f"{atom.render()} takes an "
+                                             "object that is not one of the "
+                                             "objects of the problem")
+                        row.append(ids[str(arg)])
+                    block.append(row + padding[len(row):])
+                yield np.array(block, dtype=dtype).reshape(-1, width)
+                chunk = list(islice(atoms, CHUNK_SIZE))
+
+        _save_rows(path / FACTS, blocks(), dtype, width)
+
+        meta = {"objects": tables,
+                "predicates": [list(key) for key in predicates]}
+        (path / META).write_text(json.dumps(meta), encoding="utf-8")
+        return cls(path)
+
+    def __len__(self):
+        """Number of :init atoms, after `select`"""
+        if self._predicate_ids is None:
+            return len(self._rows)
+        return sum(len(rows) for rows in self._chunks())
+
+    def select(self, predicates: list = None,
+               start: int = 0, stop: int = None) -> "FactStore":
+        """The same store restricted to some of its :init atoms. The
+        arrays are shared, not copied.
+
+        Args:
+            predicates (list, optional): PDDL names of the predicates to
+                keep, e.g. ["at"]. Defaults to all of them.
+            start (int, optional): First row to keep. Defaults to 0.
+            stop (int, optional): Row after the last one to keep.
+                Defaults to the end.
+        """
+        store = self.__class__.__new__(self.__class__)
+        store.__dict__.update(self.__dict__)
+        store._rows = self._rows[start:stop]
+        if predicates is not None:
+            ids = [i for i, (name, _, _) in enumerate(self.predicates)
+                   if name in predicates]
+            if self._predicate_ids is not None:
+                ids = [i for i in ids if i in self._predicate_ids]
+            store._predicate_ids = np.array(ids, dtype=self.facts.dtype)
+        return store
+
+    def objects(self, domain) -> dict:
+        """Object collections by attribute name, as created by
+        `create_objs`. This reads all the names into memory.
+
+        Args:
+            domain (Domain): Subclassed Domain, or an instance of it,
+                with the types of the objects.
+        """
+        collections = {}
+        for table in self.tables:
+            Type = domain._types.by_name[table["type"]]
+            names = (self._table_text(table).split(" ")
+                     if table["stop"] > table["start"] else [])
+            keys = table["keys"]
+            if isinstance(keys, dict):
+                keys = range(*keys["range"])
+            collections[table["attr"]] = PDDLObjects(Type, keys, names)
+        return collections
+
+    def load_objects(self, problem):
+        """Set the object collections as attributes of a problem
+        instance, e.g. in its `__init__`"""
+        for attr, objects in self.objects(problem).items():
+            setattr(problem, attr, objects)
+
+    def atoms(self):
+        """Iterate over the :init atoms, as one `AtomBatch` per run of
+        atoms of the same predicate, e.g. for an `@init` method to
+        return"""
+        for rows in self._chunks():
+            for predicate, columns in self._runs(rows):
+                name, negated, _ = self.predicates[predicate]
+                yield AtomBatch(name, tuple(columns), negated)
+
+    def write_objects(self, f) -> int:
+        """Write the :objects section to a text file object, as
+        `Domain._generate_objects` renders it, and return the number of
+        objects"""
+        f.write("\t(:objects\n")
+        for i, table in enumerate(self.tables):
+            if i:
+                f.write("\n")
+            f.write(f"\t\t{self._table_text(table)} - {table['type']}")
+        f.write("\n\t)")
+        return int(self.tables[-1]["stop"]) if self.tables else 0
+
+    def write_init(self, f) -> int:
+        """Write the :init atoms to a text file object, separated by
+        spaces, and return their number"""
+        formats = []
+        for name, negated, arity in self.predicates:
+            fmt = "(" + " ".join([name] + ["{}"] * arity) + ")"
+            formats.append(f"(not {fmt})" if negated else fmt)
+
+        count = 0
+        sep = ""
+        for rows in self._chunks():
+            text = " ".join([
+                " ".join(map(formats[predicate].format, *columns))
+                for predicate, columns in self._runs(rows)])
+            if text:
+                f.write(sep + text.replace("_", "-"))
+                sep = " "
+            count += len(rows)
+        return count
+
+    def _runs(self, rows):
+        """Runs of rows of the same predicate, as the predicate id and
+        one column of object names per argument"""
+        names = self._names(rows)
+        starts = [0, *(np.flatnonzero(np.diff(rows[:, 0])) + 1).tolist(),
+                  len(rows)]
+        for start, stop in zip(starts, starts[1:]):
+            predicate = int(rows[start, 0])
+            arity = self.predicates[predicate][2]
+            yield predicate, [
+                list(map(names.__getitem__, rows[start:stop, k].tolist()))
+                for k in range(1, arity + 1)]
+
+    def _chunks(self):
+        """Selected rows, CHUNK_SIZE at a time, read into memory"""
+        rows = self._rows
+        for start in range(rows.start, rows.stop, CHUNK_SIZE):
+            chunk = np.asarray(self.facts[start:min(start + CHUNK_SIZE,
+                                                    rows.stop)])
+            if self._predicate_ids is not None:
+                chunk = chunk[np.isin(chunk[:, 0], self._predicate_ids)]
+            if len(chunk):
+                yield chunk
+
+    def _names(self, rows) -> dict:
+        """Names of the objects used by some rows, by id"""
+        ids = np.unique(rows[:, 1:])
+        ids = ids[ids >= 0]
+        starts = self.offsets[ids].tolist()
+        stops = self.offsets[ids + 1].tolist()
+        names = memoryview(self.names)
+        return {i: str(names[start:stop - 1], "utf-8")
+                for i, start, stop in zip(ids.tolist(), starts, stops)}
+
+    def _table_text(self, table: dict) -> str:
+        """Names of the objects of a table, separated by spaces"""
+        start = self.offsets[table["start"]]
+        stop = self.offsets[table["stop"]]
+        return bytes(self.names[start:max(start, stop - 1)]).decode("utf-8")
+
+
+def _save_rows(filename: Path, blocks, dtype, width: int):
+    """Save 2-D blocks of rows as one .npy file without holding them all
+    in memory. The rows go to a temporary file first, as the header of a
+    .npy file needs the final shape."""
+    count = 0
+    with tempfile.TemporaryFile(dir=filename.parent) as tmp:
+        for block in blocks:
+            tmp.write(block.tobytes())
+            count += len(block)
+        tmp.seek(0)
+        with open(filename, "wb") as f:
+            np.lib.format.write_array_header_1_0(f, {
+                "descr": np.lib.format.dtype_to_descr(np.dtype(dtype)),
+                "fortran_order": False,
+                "shape": (count, width)})
+            shutil.copyfileobj(tmp, f, BUFFER_SIZE)
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("py2pddl.store needs NumPy: pip install numpy")
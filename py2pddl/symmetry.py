@@ -0,0 +1,416 @@
+from collections import Counter, defaultdict
+import fire
+
+from .py2pddl import (Atom, open_pddl, action_schema, join, _atoms, _flatten,
+                      _pddl_filename, _render_init, _render_goal, _type_name)
+from .ground import typed_objects, _object_name
+from .parse import load_problem
+
+# Nodes searched for an automorphism that maps one object to another, and
+# leaves compared when a canonical labelling has to branch
+MAX_NODES = 64
+
+
+class Symmetry:
+    """Symmetries of the objects of a problem instance
+
+    The problem is a graph of its objects and of its :init and :goal
+    facts, where each fact is joined to its arguments by their positions.
+    Objects are first coloured by their type and facts by their section,
+    predicate and negation. Colour refinement then splits the objects by
+    the colours of the facts they are in, and at which position, until
+    the colours are stable. Objects that can be exchanged have the same
+    colour, but objects of the same colour may not be exchangeable.
+
+    The orbits are found within each colour, by checking whether swapping
+    two objects maps the facts onto themselves, which holds for
+    interchangeable objects such as identical trucks, or packages with the
+    same origin and destination. If it does not, a permutation mapping
+    one object to the other is searched for by individualizing them and
+    refining the colours again, as in graph isomorphism solvers, for up to
+    `MAX_NODES` nodes. Every symmetry found is checked against the facts,
+    so the orbits may be smaller than the true ones but are never wrong.
+
+    Args:
+        problem (Domain): Instance of a subclassed Domain with its objects
+            created.
+        init (dict, optional): Keyword arguments for the `@init` method.
+        goal (dict, optional): Keyword arguments for the `@goal` method.
+        fluents (bool, optional): Whether the :init facts of the predicates
+            that actions change are part of the graph. Without them, the
+            symmetries are those of the states and actions rather than of
+            the problem, which is what `Planner` prunes the search with.
+            Defaults to True.
+    """
+
+    def __init__(self, problem, init: dict = None, goal: dict = None,
+                 fluents: bool = True):
+        self.problem = problem
+        self.fluents = fluents
+        self.objects, self.types, ids = [], [], {}
+        for Type, names in typed_objects(problem):
+            for name in names:
+                if name not in ids:
+                    ids[name] = len(self.objects)
+                    self.objects.append(name)
+                    self.types.append(Type)
+
+        changed = set()
+        if not fluents:
+            for name in problem._registry["action"]:
+                schema = action_schema(problem, name)
+                changed.update(pred for pred, _ in schema.add + schema.delete)
+
+        # Atoms of each section as (predicate, negated, object ids), and
+        # the facts of the graph, keyed on their label and arguments
+        self._atoms = {}
+        facts = {}
+        for section, method, kwargs in (("init", problem.init, init),
+                                        ("goal", problem.goal, goal)):
+            self._atoms[section] = []
+            for atom in _flatten(_atoms(method, kwargs or {})):
+                try:
+                    args = tuple(ids[_object_name(str(arg))]
+                                 for arg in atom.args)
+                except KeyError:
+                    raise ValueError(f"{atom.render()} takes an object that "
+                                     "is not one of the objects of the "
+                                     "problem") from None
+                self._atoms[section].append((atom.name, atom.negated, args))
+                if args and not (section == "init" and atom.name in changed):
+                    facts[(section, atom.name, atom.negated), args] = None
+
+        ranks = _ranks(label for label, _ in facts)
+        self._labels = [ranks[label] for label, _ in facts]
+        self._facts = [args for _, args in facts]
+        self._fact_set = {(ranks[label], args) for label, args in facts}
+        self._occurrences = [[] for _ in self.objects]
+        for f, args in enumerate(self._facts):
+            for pos, i in enumerate(args):
+                self._occurrences[i].append((f, pos))
+        self._doubled = None
+
+        self.colours = self._refine(_rank(
+            [_type_name(Type) for Type in self.types]))
+        self.generators, self.orbits = self._find_orbits()
+        self._canonical = None
+
+    def summary(self) -> str:
+        moved = sum(len(orbit) for orbit in self.orbits)
+        return (f"Found {len(self.generators)} symmetries. {moved} of "
+                f"{len(self.objects)} objects are in {len(self.orbits)} "
+                "orbits of interchangeable objects.")
+
+    def canonical_names(self) -> dict:
+        """New names of the objects, by their names, such that problems
+        that only differ by the names of their objects get the same
+        names for the objects in the same place
+
+        The objects are named after their type and numbered in the order
+        of a canonical labelling, found by individualizing one object at a
+        time and refining the colours. Where the objects to choose from
+        are not all in one orbit, every orbit is tried and the smallest
+        labelling kept, for up to `MAX_NODES` leaves, after which the
+        first one is taken and the names may depend on the order in which
+        the objects were created.
+        """
+        if not self.fluents:
+            raise ValueError("A canonical problem needs the symmetries of "
+                             "the whole problem, with fluents=True")
+        if self._canonical is None:
+            self._canonical = {}
+            counts = Counter()
+            for i in self._labelling():
+                typ = _object_name(_type_name(self.types[i]))
+                self._canonical[self.objects[i]] = f"{typ}{counts[typ]}"
+                counts[typ] += 1
+        return self._canonical
+
+    def render_canonical(self) -> str:
+        """Problem PDDL with the objects renamed by `canonical_names` and
+        the objects and atoms sorted in the canonical order"""
+        names = self.canonical_names()
+        position = {name: k for k, name in enumerate(names)}
+        renamed = [names[name] for name in self.objects]
+        rank = [position[name] for name in self.objects]
+
+        objects = defaultdict(list)
+        for i in sorted(range(len(self.objects)), key=rank.__getitem__):
+            typ = _object_name(_type_name(self.types[i]))
+            objects[typ].append(renamed[i])
+        objs = "\n".join(["\t(:objects", "\n".join(
+            f"\t\t{' '.join(group)} - {typ}" for typ, group in objects.items()),
+            "\t)"])
+
+        def atoms(section):
+            return [Atom(name, tuple(map(renamed.__getitem__, args)), negated)
+                    for name, negated, args in sorted(
+                        self._atoms[section], key=lambda atom: (
+                            atom[0], atom[1], [rank[i] for i in atom[2]]))]
+
+        return join([self.problem._generate_header_prob(), objs,
+                     "\t" + _render_init(atoms("init")),
+                     "\t" + _render_goal(atoms("goal")), ")\n"],
+                    "\n", and_marker=False)
+
+    def generate_canonical_pddl(self, *,
+                                filename: str = "canonical",
+                                verbose: bool = True,
+                                compression: str = None):
+        """Write the problem PDDL file of `render_canonical`
+
+        Args:
+            filename (str, optional): Name of the file, without the
+                extension. Defaults to "canonical".
+            verbose (bool, optional): Print the name of the file written.
+                Defaults to True.
+            compression (str, optional): "gzip" or "xz" to compress the
+                file. Defaults to None.
+        """
+        filename = _pddl_filename(filename, compression)
+        with open_pddl(filename, "w") as f:
+            f.write(self.render_canonical())
+        if verbose:
+            print(f"Canonical problem PDDL written to {filename}.")
+
+    def _refine(self, colours: list, doubled: bool = False) -> list:
+        """Colour refinement until the number of colours is stable. With
+        `doubled`, the graph is two copies of the problem, so that the
+        colours of both copies can be compared."""
+        if doubled:
+            labels, facts, occurrences = self._double()
+        else:
+            labels, facts, occurrences = (self._labels, self._facts,
+                                          self._occurrences)
+        count = len(set(colours))
+        while True:
+            fact_colours = _rank([(label, *map(colours.__getitem__, args))
+                                  for label, args in zip(labels, facts)])
+            colours = _rank([
+                (colour, tuple(sorted((fact_colours[f], pos)
+                                      for f, pos in occurrence)))
+                for colour, occurrence in zip(colours, occurrences)])
+            if len(set(colours)) == count:
+                return colours
+            count = len(set(colours))
+
+    def _double(self) -> tuple:
+        if self._doubled is None:
+            n, m = len(self.objects), len(self._facts)
+            self._doubled = (
+                self._labels * 2,
+                self._facts + [tuple(i + n for i in args)
+                               for args in self._facts],
+                self._occurrences + [[(f + m, pos) for f, pos in occurrence]
+                                     for occurrence in self._occurrences])
+        return self._doubled
+
+    def _preserves(self, perm: dict) -> bool:
+        """Whether a permutation of the objects, given by the objects it
+        moves, maps the facts onto themselves. Only the facts that take a
+        moved object can change."""
+        seen = set()
+        for i in perm:
+            for f, _ in self._occurrences[i]:
+                if f in seen:
+                    continue
+                seen.add(f)
+                args = tuple(perm.get(j, j) for j in self._facts[f])
+                if (self._labels[f], args) not in self._fact_set:
+                    return False
+        return True
+
+    def _search(self, colours: list, x: int, y: int) -> dict:
+        """Permutation of the objects that maps `x` to `y`, preserves
+        `colours` and maps the facts onto themselves, or None"""
+        n = len(self.objects)
+        nodes = 0
+
+        def search(doubled):
+            nonlocal nodes
+            nodes += 1
+            if nodes > MAX_NODES:
+                return None
+            doubled = self._refine(doubled, doubled=True)
+            left, right = doubled[:n], doubled[n:]
+            if sorted(left) != sorted(right):
+                return None
+            perm = _complete(left, right)
+            if self._preserves(perm):
+                return perm
+
+            # Try each way of individualizing the first object of the
+            # first colour that more than one object has
+            cells = Counter(left)
+            if len(cells) == n:
+                return None
+            colour = min(c for c, k in cells.items() if k > 1)
+            u = left.index(colour)
+            for v, c in enumerate(right):
+                if c == colour:
+                    perm = search(_individualize(doubled, [[u, n + v]]))
+                    if perm is not None:
+                        return perm
+            return None
+
+        return search(_individualize(colours + colours, [[x, n + y]]))
+
+    def _find_orbits(self) -> tuple:
+        parent = list(range(len(self.objects)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        generators = []
+        cells = defaultdict(list)
+        for i, colour in enumerate(self.colours):
+            cells[colour].append(i)
+        for cell in cells.values():
+            # Objects that can all be swapped with each other first, as
+            # swaps are cheap to check and are the most useful symmetries,
+            # each joined by a swap with the last object of its group
+            groups = []
+            for y in cell:
+                for group in groups:
+                    perm = {group[-1]: y, y: group[-1]}
+                    if self._preserves(perm):
+                        generators.append(perm)
+                        parent[find(y)] = find(group[-1])
+                        group.append(y)
+                        break
+                else:
+                    groups.append([y])
+
+            # Then permutations that join the groups into orbits
+            reps = []
+            for group in groups:
+                y = group[0]
+                if any(find(r) == find(y) for r in reps):
+                    continue
+                for r in reps:
+                    perm = self._search(self.colours, r, y)
+                    if perm is not None:
+                        generators.append(perm)
+                        for i, j in perm.items():
+                            parent[find(i)] = find(j)
+                        break
+                else:
+                    reps.append(y)
+
+        orbits = defaultdict(list)
+        for i in range(len(self.objects)):
+            orbits[find(i)].append(self.objects[i])
+        names = self.objects
+        return ([{names[i]: names[j] for i, j in perm.items()}
+                 for perm in generators],
+                [orbit for orbit in orbits.values() if len(orbit) > 1])
+
+    def _labelling(self) -> list:
+        """Object ids in canonical order"""
+        n = len(self.objects)
+        leaves = 0
+
+        def label(colours):
+            nonlocal leaves
+            cells = Counter(colours)
+            while len(cells) < n:
+                colour = min(c for c, k in cells.items() if k > 1)
+                cell = [i for i, c in enumerate(colours) if c == colour]
+                if all(self._preserves({cell[0]: i, i: cell[0]})
+                       for i in cell[1:]):
+                    # Any order of objects that can all be swapped with
+                    # each other gives the same problem
+                    colours = _individualize(colours, [[i] for i in cell])
+                else:
+                    reps = [cell[0]]
+                    for i in cell[1:]:
+                        if all(self._search(colours, r, i) is None
+                               for r in reps):
+                            reps.append(i)
+                    if len(reps) > 1 and leaves < MAX_NODES:
+                        return min(label(self._refine(
+                            _individualize(colours, [[r]]))) for r in reps)
+                    colours = _individualize(colours, [[cell[0]]])
+                colours = self._refine(colours)
+                cells = Counter(colours)
+
+            leaves += 1
+            order = sorted(range(n), key=colours.__getitem__)
+            position = {i: k for k, i in enumerate(order)}
+            certificate = sorted(
+                (label, tuple(map(position.__getitem__, args)))
+                for label, args in zip(self._labels, self._facts))
+            return certificate, order
+
+        return label(self.colours)[1]
+
+
+def _rank(keys: list) -> list:
+    """Each key replaced by its rank among the distinct keys"""
+    ranks = _ranks(keys)
+    return [ranks[key] for key in keys]
+
+
+def _ranks(keys) -> dict:
+    return {key: i for i, key in enumerate(sorted(set(keys)))}
+
+
+def _individualize(colours: list, groups: list) -> list:
+    """Colours with each group of objects given a colour of its own,
+    between their colour and the next one"""
+    keys = [(colour, 0) for colour in colours]
+    for k, group in enumerate(groups):
+        for i in group:
+            keys[i] = (colours[i], k + 1)
+    return _rank(keys)
+
+
+def _complete(left: list, right: list) -> dict:
+    """Permutation that maps each object of the left copy to an object of
+    the right copy with the same colour, keeping objects in place where
+    it can, given by the objects it moves"""
+    cells = defaultdict(list)
+    for j, colour in enumerate(right):
+        cells[colour].append(j)
+    sources = defaultdict(list)
+    for i, colour in enumerate(left):
+        if right[i] != colour:
+            sources[colour].append(i)
+    perm = {}
+    for colour, targets in cells.items():
+        targets = [j for j in targets if left[j] != colour]
+        perm.update(zip(sources[colour], targets))
+    return perm
+
+
+def symmetry(infile: str,
+             init: dict = None,
+             goal: dict = None,
+             fluents: bool = True,
+             canonical: str = None):
+    """Print the orbits of interchangeable objects of the problem of a
+    Python module
+
+    Args:
+        infile (str): Name of Python file containing both the Domain
+            and Problem class definitions.
+        init (dict, optional): Keyword arguments for the `@init` method.
+        goal (dict, optional): Keyword arguments for the `@goal` method.
+        fluents (bool, optional): Include the :init facts that actions
+            change. See `Symmetry`. Defaults to True.
+        canonical (str, optional): Also write the canonical problem to
+            this file, without the extension. Defaults to None.
+    """
+    result = Symmetry(load_problem(infile)(), init, goal, fluents)
+    for orbit in result.orbits:
+        print(" ".join(orbit))
+    print(result.summary())
+    if canonical is not None:
+        result.generate_canonical_pddl(filename=canonical)
+
+
+if __name__ == "__main__":
+    fire.Fire(symmetry)
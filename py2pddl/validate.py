@@ -0,0 +1,173 @@
+from collections import namedtuple
+import fire
+
+from .py2pddl import open_pddl, _atoms, _flatten
+from .ground import strips_schema, type_index, ground_atom
+from .parse import load_problem
+
+# Outcome of validating one plan. `step` is the index of the failing step
+# (or None), `atom` is the precondition or goal atom that does not hold.
+PlanResult = namedtuple(
+    "PlanResult", ["valid", "steps", "step", "action", "atom", "message"])
+
+
+class Validator:
+    """Checks plans against a problem instance
+
+    Ground atoms are numbered as they are first seen, and a state is a
+    Python integer used as a bitset over these numbers. The precondition,
+    add and delete masks of each ground action are computed once and
+    shared by all plans validated with the same validator.
+
+    Args:
+        problem (Domain): Instance of a subclassed Domain with its objects
+            created.
+        init (dict, optional): Keyword arguments for the `@init` method.
+        goal (dict, optional): Keyword arguments for the `@goal` method.
+    """
+
+    def __init__(self, problem, init: dict = None, goal: dict = None):
+        self.problem = problem
+        self.schemas = {}
+        for name, fn in problem._registry["action"].items():
+            self.schemas[fn.name] = strips_schema(problem, name)
+        self.objects = {Type: set(names)
+                        for Type, names in type_index(problem).items()}
+
+        self.atoms = []
+        self._ids = {}
+        # Atoms not in :init are false, so negated :init atoms add nothing
+        self.init = self.mask(ground_atom(atom) for atom in
+                              _flatten(_atoms(problem.init, init or {}))
+                              if not atom.negated)
+        # Atoms of the goal that must hold, and negated ones that must not
+        goals = list(_flatten(_atoms(problem.goal, goal or {})))
+        self.goal = self.mask(ground_atom(atom) for atom in goals
+                              if not atom.negated)
+        self.avoid = self.mask(ground_atom(atom) for atom in goals
+                               if atom.negated)
+        self._actions = {}
+
+    def mask(self, atoms) -> int:
+        """Bitset of ground atoms"""
+        mask = 0
+        for atom in atoms:
+            i = self._ids.get(atom)
+            if i is None:
+                i = self._ids[atom] = len(self.atoms)
+                self.atoms.append(atom)
+            mask |= 1 << i
+        return mask
+
+    def action(self, step: tuple) -> tuple:
+        """Precondition, add and delete masks of a ground action given as
+        a tuple of its name and arguments"""
+        if step in self._actions:
+            return self._actions[step]
+
+        name, *args = step
+        schema = self.schemas.get(name)
+        if schema is None:
+            raise ValueError(f"Unknown action '{name}'")
+        if len(args) != len(schema.params):
+            raise ValueError(f"Action '{name}' takes {len(schema.params)} "
+                             f"arguments but {len(args)} were given")
+        for arg, Type in zip(args, schema.types):
+            if arg not in self.objects.get(Type, ()):
+                raise ValueError(f"Expected an object of type {Type.__name__} "
+                                 f"for action '{name}' but found '{arg}'")
+
+        def mask(atoms):
+            return self.mask((pred, *map(args.__getitem__, params))
+                             for pred, params in atoms)
+
+        masks = mask(schema.precond), mask(schema.add), mask(schema.delete)
+        self._actions[step] = masks
+        return masks
+
+    def validate(self, plan) -> PlanResult:
+        """Simulate a plan from :init and check that every precondition
+        holds and that the goal is reached
+
+        Args:
+            plan (str or list): Name of a plan file in the format of
+                Fast Downward's `sas_plan`, or a list of steps as tuples
+                of the action name and its arguments.
+        """
+        if isinstance(plan, str):
+            plan = read_plan(plan)
+
+        state = self.init
+        for i, step in enumerate(plan):
+            try:
+                precond, add, delete = self.action(step)
+            except ValueError as e:
+                return PlanResult(False, len(plan), i, step, None, str(e))
+
+            missing = precond & ~state
+            if missing:
+                atom = self._first(missing)
+                return PlanResult(
+                    False, len(plan), i, step, atom,
+                    f"Step {i} {_render(step)}: precondition "
+                    f"{_render(atom)} does not hold")
+            state = (state & ~delete) | add
+
+        steps = len(plan)
+        missing = self.goal & ~state
+        if missing:
+            atom = self._first(missing)
+            return PlanResult(False, steps, None, None, atom,
+                              f"Goal {_render(atom)} is not reached")
+        present = self.avoid & state
+        if present:
+            atom = self._first(present)
+            return PlanResult(False, steps, None, None, atom,
+                              f"Goal (not {_render(atom)}) is not reached")
+        return PlanResult(True, steps, None, None, None,
+                          f"Plan with {steps} steps is valid")
+
+    def validate_many(self, plans) -> list:
+        """Validate several plans, reusing the ground actions"""
+        return [self.validate(plan) for plan in plans]
+
+    def _first(self, mask: int):
+        return self.atoms[(mask & -mask).bit_length() - 1]
+
+
+def read_plan(filename: str) -> list:
+    """Steps of a plan file in the format of Fast Downward's `sas_plan`,
+    i.e. one `(action arg1 arg2 ...)` per line and `;` comments. Files
+    ending with ".gz" or ".xz" are decompressed."""
+    plan = []
+    with open_pddl(filename) as f:
+        for line in f:
+            line = line.split(";", 1)[0].strip()
+            if line:
+                plan.append(tuple(line.strip("()").lower().split()))
+    return plan
+
+
+def validate(infile: str, *plans):
+    """Validate plan files against the problem of a Python module
+
+    Args:
+        infile (str): Name of Python file containing both the Domain
+            and Problem class definitions.
+        plans (str): Names of plan files.
+    """
+    validator = Validator(load_problem(infile)())
+    results = validator.validate_many(plans)
+    for plan, result in zip(plans, results):
+        print(f"{'ok' if result.valid else 'INVALID':<8} {plan}: "
+              f"{result.message}")
+    if not all(result.valid for result in results):
+        raise SystemExit(1)
+
+
+def _render(atom: tuple) -> str:
+    return "(" + " ".join(atom) + ")"
+
+
+if __name__ == "__main__":
+    fire.Fire(validate)